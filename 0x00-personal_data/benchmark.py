@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+""" Benchmark suite for the personal data redaction and hashing paths
+
+Every case is warmed up, then timed over several repeats, each of which
+runs enough calls to last at least 0.2s. The median time per call is what
+gets saved and compared.
+
+Cases are parametrized by number of PII fields, message length and
+separator (filter_datum, the original regex filter_datum and
+RedactingFormatter.format) and by bcrypt cost factor (hash_password and
+is_valid). hash_passwords is timed on a batch with 1 worker up to one
+worker per core to show its scaling. With --db, opening a new connection
+per query is compared with checking one out of the pool.
+
+Usage:
+    ./benchmark.py [-k filter] [--save baseline.json]
+    ./benchmark.py --compare baseline.json [--threshold 10]
+
+Functions:
+    legacy_filter_datum() - Original filter_datum, kept as a baseline
+    make_message() - Builds a message with n PII fields
+    redaction_case() - Sets up a redaction case
+    is_valid_case() - Sets up an is_valid case
+    hash_passwords_case() - Sets up a hash_passwords case
+    cases() - Yields the benchmark cases
+    measure() - Times one case
+    compare() - Compares results against a baseline
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import statistics
+import sys
+import timeit
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from encrypt_password import hash_password, hash_passwords, is_valid
+from filtered_logger import (RedactingFormatter, connect_db, filter_datum,
+                             get_db)
+
+
+FIELD_COUNTS = (5, 50, 500)
+MESSAGE_LENGTHS = (256, 4096)
+SEPARATORS = (";", "|")
+BCRYPT_COSTS = (4, 10, 12)
+BATCH_SIZE = 64
+BATCH_COST = 8
+
+
+def legacy_filter_datum(fields: List[str], redaction: str, message: str,
+                        separator: str) -> str:
+    """ Original implementation of filter_datum, kept as a baseline """
+    fields_str = ('|').join(fields)
+    return re.sub(rf"({fields_str})=[^{separator}]+", rf"\1={redaction}",
+                  message)
+
+
+def make_message(n_fields: int, length: int,
+                 separator: str) -> Tuple[List[str], str]:
+    """ Returns (fields, message) with `n_fields` PII fields
+
+    Args:
+        n_fields (int): Number of PII fields in the message
+        length (int): Minimum message length, reached by padding a
+            non-PII `user_agent` field
+        separator (str): Separator of fields in the message
+
+    Returns:
+        (tuple): List of field names and the message
+    """
+    fields = ["field_{}".format(i) for i in range(n_fields)]
+    message = separator.join("{}=value{}".format(f, i)
+                             for i, f in enumerate(fields)) + separator
+    padding = max(length - len(message) - len("user_agent="), 1)
+    message += "user_agent=" + "x" * padding
+    return fields, message
+
+
+def query(connect: Callable) -> None:
+    """ Runs one `SELECT COUNT(*)` on a connection from `connect` """
+    db = connect()
+    cursor = db.cursor()
+    cursor.execute("SELECT COUNT(*) FROM users;")
+    cursor.fetchone()
+    cursor.close()
+    db.close()
+
+
+def format_record(formatter: logging.Formatter, message: str) -> str:
+    """ Formats a fresh INFO record carrying `message` """
+    record = logging.LogRecord("user_data", logging.INFO, None, None,
+                               message, None, None)
+    return formatter.format(record)
+
+
+def redaction_case(n_fields: int, length: int, sep: str,
+                   name: str) -> Callable:
+    """ Builds the message of a redaction case and returns its function
+
+    Args:
+        n_fields (int): Number of PII fields in the message
+        length (int): Minimum message length
+        sep (str): Separator of fields in the message
+        name (str): `filter_datum`, `legacy_filter_datum` or
+            `RedactingFormatter.format`
+    """
+    fields, message = make_message(n_fields, length, sep)
+    if name == "filter_datum":
+        return lambda: filter_datum(fields, "***", message, sep)
+    if name == "legacy_filter_datum":
+        return lambda: legacy_filter_datum(fields, "***", message, sep)
+    formatter = RedactingFormatter(fields)
+    return lambda: format_record(formatter, message)
+
+
+def is_valid_case(cost: int) -> Callable:
+    """ Hashes the password of an is_valid case and returns its function """
+    hashed = hash_password("MyAmazingPassw0rd", cost)
+    return lambda: is_valid(hashed, "MyAmazingPassw0rd")
+
+
+def hash_passwords_case(workers: int) -> Callable:
+    """ Builds the batch of a hash_passwords case and returns its function
+    """
+    passwords = ["MyAmazingPassw0rd{}".format(i) for i in range(BATCH_SIZE)]
+    return lambda: list(hash_passwords(passwords, BATCH_COST, workers))
+
+
+def cases(with_db: bool = False) -> Iterator[Tuple[str, Callable]]:
+    """ Yields (name, setup) for every benchmark case
+
+    `setup()` builds the fixtures of the case, such as its messages or
+    bcrypt hashes, and returns the function to time. It is only called for
+    the cases that are run, so filtering out the costly bcrypt cases also
+    skips hashing their fixtures.
+
+    Args:
+        with_db (bool): Also yield the connection pooling cases
+    """
+    for n_fields in FIELD_COUNTS:
+        for length in MESSAGE_LENGTHS:
+            for sep in SEPARATORS:
+                params = "fields={},len={},sep={}".format(
+                    n_fields, length, sep)
+                names = ["filter_datum", "legacy_filter_datum"]
+                # The formatter has a fixed separator
+                if sep == RedactingFormatter.SEPARATOR:
+                    names.append("RedactingFormatter.format")
+                for name in names:
+                    yield ("{}[{}]".format(name, params),
+                           lambda n=n_fields, ln=length, s=sep, nm=name:
+                           redaction_case(n, ln, s, nm))
+
+    for cost in BCRYPT_COSTS:
+        yield ("hash_password[cost={}]".format(cost),
+               lambda c=cost: lambda: hash_password("MyAmazingPassw0rd", c))
+        yield ("is_valid[cost={}]".format(cost),
+               lambda c=cost: is_valid_case(c))
+
+    cores = os.cpu_count() or 1
+    for workers in sorted({1, cores} | {n for n in (2, 4, 8) if n < cores}):
+        yield ("hash_passwords[n={},cost={},workers={}]".format(
+                   BATCH_SIZE, BATCH_COST, workers),
+               lambda w=workers: hash_passwords_case(w))
+
+    if with_db:
+        yield "connect_db+query", lambda: lambda: query(connect_db)
+        yield "get_db+query", lambda: lambda: query(get_db)
+
+
+def measure(func: Callable, repeat: int, warmup: int) -> Dict[str, float]:
+    """ Times `func` after `warmup` throwaway runs
+
+    Args:
+        func (callable): Function to time
+        repeat (int): Number of timed runs
+        warmup (int): Number of untimed runs
+
+    Returns:
+        (dict): Median and min seconds per call, and calls per second
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    for _ in range(warmup):
+        timer.timeit(number)
+    per_call = [t / number for t in timer.repeat(repeat, number)]
+    median = statistics.median(per_call)
+    return {"median_s": median, "min_s": min(per_call),
+            "ops_per_sec": 1 / median}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """ Prints the change of every case against `baseline`
+
+    Args:
+        results (dict): Current results
+        baseline (dict): Saved results
+        threshold (float): Allowed slowdown in percent
+
+    Returns:
+        (bool): True if no case is more than `threshold`% slower
+    """
+    ok = True
+    for name, result in results.items():
+        if name not in baseline:
+            print("{:<60} new".format(name))
+            continue
+        change = (result["median_s"] / baseline[name]["median_s"] - 1) * 100
+        status = "ok"
+        if change > threshold:
+            status = "REGRESSION"
+            ok = False
+        print("{:<60} {:+8.1f}% {}".format(name, change, status))
+    return ok
+
+
+def main() -> None:
+    """ Runs the suite, then saves or compares the results """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the redaction and hashing paths")
+    parser.add_argument("-k", "--filter", default="",
+                        help="only run cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--db", action="store_true",
+                        help="include connection pooling cases")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare to")
+    parser.add_argument("--threshold", type=float, default=10,
+                        help="allowed slowdown in percent (default 10)")
+    args = parser.parse_args()
+
+    results = {}
+    for name, setup in cases(args.db):
+        if args.filter not in name:
+            continue
+        results[name] = measure(setup(), args.repeat, args.warmup)
+        print("{:<60} {:>14.1f} ops/s".format(
+            name, results[name]["ops_per_sec"]))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        print()
+        if not compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+""" Database connection pooling and backends
+
+Classes:
+    PoolTimeoutError - Raised when a checkout times out
+    ConnectionPool - Bounded pool of reusable database connections
+    PooledConnection - Connection that goes back to its pool on close
+    SQLiteConnection - SQLite connection with the mysql.connector interface
+    SQLiteCursor - SQLite cursor accepting `%s` placeholders
+
+Functions:
+    load_users_csv() - Loads a users CSV file into a `users` table
+"""
+import csv
+import queue
+import sqlite3
+import threading
+from typing import Callable
+
+
+class PoolTimeoutError(Exception):
+    """ Raised when no connection is released within the checkout timeout
+    """
+
+
+class SQLiteCursor():
+    """ SQLite cursor accepting the `%s` placeholders used with MySQL """
+    def __init__(self, cursor: sqlite3.Cursor):
+        self._cursor = cursor
+
+    def execute(self, query: str, params: tuple = ()) -> None:
+        """ Executes a query written with `%s` placeholders """
+        self._cursor.execute(query.replace('%s', '?'), params)
+
+    def fetchone(self) -> tuple:
+        """ Returns the next row, or None """
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size: int) -> list:
+        """ Returns up to `size` rows """
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self) -> list:
+        """ Returns all remaining rows """
+        return self._cursor.fetchall()
+
+    def close(self) -> None:
+        """ Closes the cursor """
+        self._cursor.close()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+class SQLiteConnection():
+    """ SQLite connection exposing the parts of MySQLConnection we use """
+    def __init__(self, database: str):
+        self._conn = sqlite3.connect(database, check_same_thread=False)
+        self._closed = False
+
+    def cursor(self, buffered: bool = None) -> SQLiteCursor:
+        """ Returns a cursor; SQLite cursors are always unbuffered """
+        return SQLiteCursor(self._conn.cursor())
+
+    def is_connected(self) -> bool:
+        """ Returns True if the connection is usable """
+        if self._closed:
+            return False
+        try:
+            self._conn.execute("SELECT 1;")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def commit(self) -> None:
+        """ Commits the current transaction """
+        self._conn.commit()
+
+    def rollback(self) -> None:
+        """ Rolls back the current transaction """
+        self._conn.rollback()
+
+    def close(self) -> None:
+        """ Closes the connection """
+        self._closed = True
+        self._conn.close()
+
+
+def load_users_csv(db, csv_path: str) -> int:
+    """ Creates the `users` table if missing and loads it from a CSV file
+
+    Args:
+        db: Connection with the mysql.connector interface
+        csv_path (str): CSV file whose header names the columns
+
+    Returns:
+        (int): Number of rows loaded, 0 if the table already existed
+    """
+    cursor = db.cursor()
+    try:
+        cursor.execute("SELECT name FROM sqlite_master "
+                       "WHERE type = 'table' AND name = 'users';")
+        if cursor.fetchone():
+            return 0
+
+        with open(csv_path, newline='') as f:
+            reader = csv.reader(f)
+            columns = next(reader)
+            cursor.execute("CREATE TABLE users ({});".format(
+                ", ".join("{} TEXT".format(c) for c in columns)))
+            cursor.execute("CREATE INDEX users_last_login "
+                           "ON users (last_login);")
+            query = "INSERT INTO users VALUES ({});".format(
+                ", ".join("%s" for _ in columns))
+            count = 0
+            for row in reader:
+                cursor.execute(query, tuple(row))
+                count += 1
+        db.commit()
+    finally:
+        cursor.close()
+
+    return count
+
+
+class PooledConnection():
+    """ Wraps a pooled connection; `close()` returns it to the pool """
+    def __init__(self, pool: 'ConnectionPool', conn):
+        self._pool = pool
+        self._conn = conn
+
+    def close(self) -> None:
+        """ Releases the connection back to its pool """
+        if self._conn is not None:
+            self._pool.release(self._conn)
+            self._conn = None
+
+    def __getattr__(self, name: str):
+        if self._conn is None:
+            raise AttributeError("connection was released to its pool")
+        return getattr(self._conn, name)
+
+    def __enter__(self) -> 'PooledConnection':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class ConnectionPool():
+    """ Bounded pool of reusable database connections
+
+    At most `size` connections exist at a time. A checkout waits up to
+    `timeout` seconds for a release once they are all in use, and
+    connections failing their health check are replaced.
+    """
+    def __init__(self, connect: Callable, size: int = 5,
+                 timeout: float = 30.0):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def get(self) -> PooledConnection:
+        """ Checks out a healthy connection
+
+        Raises:
+            PoolTimeoutError: If no connection frees up within `timeout`
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeoutError(
+                "no connection available after {}s".format(self.timeout))
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+        return PooledConnection(self, conn)
+
+    def _checkout(self):
+        """ Returns an idle connection that passes its health check, or a
+        new one
+        """
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if self._is_healthy(conn):
+                return conn
+            self._discard(conn)
+
+    def release(self, conn) -> None:
+        """ Returns a connection to the pool, closing it if it is unusable
+        """
+        try:
+            if getattr(conn, 'unread_result', False):
+                # Unread rows from an unbuffered cursor make it unusable
+                self._discard(conn)
+            else:
+                # End the transaction so the next user sees fresh data
+                conn.rollback()
+                self._idle.put(conn)
+        except Exception:
+            self._discard(conn)
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        """ Closes every idle connection """
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    @staticmethod
+    def _is_healthy(conn) -> bool:
+        """ Returns True if `conn` is still connected """
+        try:
+            return conn.is_connected()
+        except Exception:
+            return False
+
+    @staticmethod
+    def _discard(conn) -> None:
+        """ Closes a connection, ignoring errors """
+        try:
+            conn.close()
+        except Exception:
+            pass
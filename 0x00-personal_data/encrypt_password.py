@@ -2,23 +2,172 @@
 """ Manages password encryption
 
 Functions:
+    calibrate_cost: Finds the highest bcrypt cost within a latency budget
+    calibrate: Calibrates the bcrypt cost of this host and caches it
+    get_cost: Returns the cached bcrypt cost
     hash_password: Hashes a given password using bcrypt
     is_valid: Validates that a provided password matches a given hashed
               password
+    needs_rehash: Checks if a hashed password uses a lower cost than the
+                  calibrated one
+    verify_and_rehash: Validates a password and rehashes it if outdated
+    hash_passwords: Hashes many passwords on a thread pool
+    verify_many: Validates many (hashed_password, password) pairs on a
+                 thread pool
+
+Classes:
+    Result: Outcome of one item of a batch
+
+Calibration takes a few hashes at increasing costs, so it is an explicit
+step, run at deployment or startup rather than by the first login:
+
+    python3 encrypt_password.py
 """
 import bcrypt
+import json
+import os
+import platform
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import (Any, Callable, Iterable, Iterator, NamedTuple, Optional,
+                    Tuple)
+
+
+MIN_COST = 4
+MAX_COST = 16
+DEFAULT_BUDGET_MS = 250
+DEFAULT_COST = 12
+COST_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               ".bcrypt_cost.json")
+
+_cost = None
+
+
+class Result(NamedTuple):
+    """ Outcome of one item of a batch: `value` is None if `error` is set
+    """
+    value: Any
+    error: Exception = None
+
+
+def _time_hash(cost: int) -> float:
+    """ Returns the seconds taken to hash a password at `cost` """
+    salt = bcrypt.gensalt(cost)
+    start = time.perf_counter()
+    bcrypt.hashpw(b"calibration password", salt)
+    return time.perf_counter() - start
+
+
+def calibrate_cost(budget_ms: float = DEFAULT_BUDGET_MS,
+                   min_cost: int = MIN_COST, max_cost: int = MAX_COST) -> int:
+    """ Finds the highest bcrypt cost whose hashing fits a latency budget
+
+    Each cost doubles the hashing time, so costs are tried upwards until
+    the next one would exceed the budget.
+
+    Args:
+        budget_ms(float): Maximum hashing latency in milliseconds
+        min_cost(int): Lowest cost to return, even if over budget
+        max_cost(int): Highest cost to return
+
+    Returns:
+        (int): bcrypt cost factor
+    """
+    budget = budget_ms / 1000
+    cost = min_cost
+    elapsed = _time_hash(cost)
+    while cost < max_cost and elapsed * 2 <= budget:
+        cost += 1
+        elapsed = _time_hash(cost)
+    if elapsed > budget and cost > min_cost:
+        cost -= 1
+    return cost
+
+
+def _cache_settings() -> Tuple[str, dict]:
+    """ Returns the cache file and the key its cost must match """
+    budget_ms = float(os.getenv("BCRYPT_LATENCY_BUDGET_MS",
+                                DEFAULT_BUDGET_MS))
+    cache_file = os.getenv("BCRYPT_COST_CACHE", COST_CACHE_FILE)
+    key = {"host": platform.node(), "cpus": os.cpu_count(),
+           "budget_ms": budget_ms}
+    return cache_file, key
 
 
-def hash_password(password: str) -> bytes:
+def _read_cached_cost() -> Optional[int]:
+    """ Returns the cached cost if it was calibrated for this host and
+    budget, otherwise None
+    """
+    cache_file, key = _cache_settings()
+    try:
+        with open(cache_file, 'r') as f:
+            cached = json.load(f)
+        if all(cached.get(k) == v for k, v in key.items()):
+            return int(cached["cost"])
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        pass
+    return None
+
+
+def calibrate(force: bool = False) -> int:
+    """ Calibrates the bcrypt cost of this host and caches it
+
+    The cost is calibrated against the `BCRYPT_LATENCY_BUDGET_MS`
+    environment variable (default 250) and written to the
+    `BCRYPT_COST_CACHE` file (default `.bcrypt_cost.json` next to this
+    module), keyed by host, core count and budget.
+
+    Args:
+        force(bool): Calibrate even if a matching cost is cached
+
+    Returns:
+        (int): bcrypt cost factor
+    """
+    global _cost
+
+    cost = None if force else _read_cached_cost()
+    if cost is None:
+        cache_file, key = _cache_settings()
+        cost = calibrate_cost(key["budget_ms"])
+        try:
+            with open(cache_file, 'w') as f:
+                json.dump(dict(key, cost=cost), f)
+        except OSError:
+            pass
+    _cost = cost
+    return _cost
+
+
+def get_cost() -> int:
+    """ Returns the bcrypt cost for this host
+
+    The cost cached by `calibrate` is read once. Without a cost cached
+    for this host and budget, DEFAULT_COST is used: hashing never
+    calibrates on its own.
+
+    Returns:
+        (int): bcrypt cost factor
+    """
+    global _cost
+
+    if _cost is None:
+        cost = _read_cached_cost()
+        _cost = DEFAULT_COST if cost is None else cost
+    return _cost
+
+
+def hash_password(password: str, rounds: int = None) -> bytes:
     """ Hashes a given password
     Args:
         password(str): Password to hash
+        rounds(int): bcrypt cost factor, the calibrated cost if None
     Returns:
         (bytes): Salted hashed password
     """
     if not password:
         return b""
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(get_cost() if rounds is None else rounds)
     return bcrypt.hashpw(password.encode('utf-8'), salt)
 
 
@@ -35,3 +184,121 @@ def is_valid(hashed_password: bytes, password: str) -> bool:
     if not hashed_password or not password:
         return False
     return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
+
+
+def needs_rehash(hashed_password: bytes) -> bool:
+    """ Checks if a hashed password was made with an outdated cost
+
+    Hashes made at a higher cost, such as on a faster host, are kept, so
+    hosts calibrated differently do not keep rehashing each other's
+    hashes down and up.
+
+    Args:
+        hashed_password(bytes): Hashed password, `$2b$<cost>$...`, as
+            bytes or str
+
+    Returns:
+        (bool): True if its cost is lower than the calibrated cost, or if
+            it is not a bcrypt hash
+    """
+    if isinstance(hashed_password, str):
+        hashed_password = hashed_password.encode('utf-8')
+    try:
+        return int(hashed_password.split(b"$")[2]) < get_cost()
+    except (IndexError, ValueError, TypeError, AttributeError):
+        return True
+
+
+def verify_and_rehash(hashed_password: bytes,
+                      password: str) -> Tuple[bool, Optional[bytes]]:
+    """ Validates a password and rehashes it if its cost is outdated
+
+    Meant for login: store the new hash whenever one is returned.
+
+    Args:
+        hashed_password(bytes): Hashed password
+        password(str): Password to validate
+
+    Returns:
+        (tuple): Whether the password is valid, and a new hash at the
+            calibrated cost if it is valid but below that cost, otherwise
+            None
+    """
+    if not is_valid(hashed_password, password):
+        return False, None
+    if needs_rehash(hashed_password):
+        return True, hash_password(password)
+    return True, None
+
+
+def _run_batch(func: Callable, items: Iterable[tuple],
+               workers: int = None) -> Iterator[Result]:
+    """ Applies `func` to every item on a bounded thread pool
+
+    bcrypt releases the GIL while hashing, so threads run in parallel.
+    Items are consumed lazily and at most two per worker are in flight, so
+    memory use does not depend on the number of items.
+
+    Args:
+        func(callable): Function called with the unpacked item
+        items(iterable of tuple): Arguments for each call
+        workers(int): Pool size, the number of cores if None
+
+    Yields:
+        (Result): Result of each item, in input order
+    """
+    def call(args: tuple) -> Result:
+        try:
+            return Result(func(*args))
+        except Exception as e:
+            return Result(None, e)
+
+    workers = workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for args in items:
+            pending.append(executor.submit(call, args))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def hash_passwords(passwords: Iterable[str], rounds: int = None,
+                   workers: int = None) -> Iterator[Result]:
+    """ Hashes many passwords on a thread pool
+
+    Args:
+        passwords(iterable of str): Passwords to hash, read lazily
+        rounds(int): bcrypt cost factor, the calibrated cost if None
+        workers(int): Pool size, the number of cores if None
+
+    Yields:
+        (Result): Salted hashed password or error, in input order
+
+    Example:
+        >>> for result in hash_passwords(["pass1", "pass2"]):
+        ...     print(result.value, result.error)
+    """
+    return _run_batch(hash_password,
+                      ((password, rounds) for password in passwords),
+                      workers)
+
+
+def verify_many(pairs: Iterable[Tuple[bytes, str]],
+                workers: int = None) -> Iterator[Result]:
+    """ Validates many passwords against their hashes on a thread pool
+
+    Args:
+        pairs(iterable of tuple): (hashed_password, password) pairs, read
+            lazily
+        workers(int): Pool size, the number of cores if None
+
+    Yields:
+        (Result): True or False, or the error, in input order
+    """
+    return _run_batch(is_valid, pairs, workers)
+
+
+if __name__ == "__main__":
+    print(calibrate(force=True))
@@ -3,18 +3,139 @@
 
 Functions:
     filter_datum() - Returns a log mesage obfuscated
+    get_redactor() - Returns a cached Redactor
+    get_logger() - Returns a custom logger
+    connect_db() - Opens a connection to the configured backend
+    get_pool() - Returns this process's connection pool
+    get_db() - Returns a pooled database connector
+    fetch_rows() - Yields rows from a cursor in batches
+    partition_bounds() - Splits `users` into `last_login` ranges
+    export_partition() - Redacts one range of `users` into a file
+    parallel_export() - Exports `users` across a process pool
+    report_stats() - Prints rows/sec and peak RSS
+    main() - Exports the `users` table through the redacting logger
 
 Classes:
+    Redactor
     RedactingFormatter
+    StructuredQueueHandler
+    RedactingQueueListener
 """
+import atexit
 import logging
+import logging.handlers
 import mysql.connector
+import os
+import queue
 import re
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from os import environ
-from typing import List
+from collections.abc import Mapping
+from db_pool import (ConnectionPool, PooledConnection, SQLiteConnection,
+                     load_users_csv)
+from typing import Iterable, Iterator, List, Sequence, Tuple
 
 
 PII_FIELDS = ("name", "email", "phone", "ssn", "password")
+USER_COLUMNS = ("name", "email", "phone", "ssn", "password", "ip",
+                "last_login", "user_agent")
+USER_ROW_FORMAT = ";".join(f"{column}=%({column})s" for column in USER_COLUMNS)
+
+
+class Redactor():
+    """ Obfuscates field values in log messages
+
+    Built once for a given set of fields, redaction and separator: the
+    fields are compiled into a single regex instead of one per call. A key
+    only counts when no word character precedes it, so `name` does not
+    match inside `username`, while keys after any other delimiter, such
+    as `,password=`, `&password=` or `[prefix] password=`, are redacted.
+    This is `(?<!\\w)`, checked on each match rather than in the regex,
+    which keeps the literal prefix scan of the regex engine. Fields, redaction
+    and separator may all be bytes to redact raw bytes messages without
+    decoding them.
+    """
+    def __init__(self, fields: Sequence[str], redaction: str,
+                 separator: str):
+        self.fields = frozenset(fields)
+        self.redaction = redaction
+        self.separator = separator
+        self._pattern = None
+        if not self.fields:
+            return
+        is_bytes = isinstance(separator, bytes)
+
+        def text(value):
+            return value.decode('latin-1') \
+                if isinstance(value, bytes) else value
+
+        sep = re.escape(text(separator))
+        keys = "|".join(re.escape(text(field))
+                        for field in sorted(self.fields, key=len,
+                                            reverse=True))
+        pattern = rf"({keys})=[^{sep}]+"
+        word = r"\w"
+        if is_bytes:
+            pattern = pattern.encode('latin-1')
+            word = word.encode('latin-1')
+        self._pattern = re.compile(pattern)
+        self._word = re.compile(word)
+
+    def redact(self, message: str) -> str:
+        """ Returns `message` with the values of `fields` obfuscated
+
+        Args:
+            message (str): Log message
+
+        Returns:
+            (str): Log message obfuscated
+        """
+        if self._pattern is None:
+            return message
+
+        search = self._pattern.search
+        word = self._word.match
+        parts = []
+        last = position = 0
+        match = search(message)
+        while match is not None:
+            start = match.start()
+            if start == 0 or word(message, start - 1) is None:
+                parts.append(message[last:match.end(1) + 1])
+                parts.append(self.redaction)
+                last = position = match.end()
+            else:
+                # Not a key, such as `name` in `username`: look further
+                position = start + 1
+            match = search(message, position)
+        if not parts:
+            return message
+        parts.append(message[last:])
+        return message[:0].join(parts)
+
+
+@lru_cache(maxsize=128)
+def get_redactor(fields: Sequence[str], redaction: str,
+                 separator: str) -> Redactor:
+    """ Returns a Redactor compiled once per (fields, redaction, separator)
+
+    Args:
+        fields (tuple of str): Fields in log message to obfuscate
+        redaction (str): Character to replace fields values with
+        separator (str): Separator of fields in log message
+
+    Returns:
+        (Redactor): Cached redactor
+    """
+    return Redactor(fields, redaction, separator)
 
 
 def filter_datum(fields: List[str], redaction: str, message: str,
@@ -35,9 +156,7 @@ def filter_datum(fields: List[str], redaction: str, message: str,
                   ';'))
         name=love;password=xxx
     """
-    fields_str = ('|').join(fields)
-    return re.sub(rf"({fields_str})=[^{separator}]+", rf"\1={redaction}",
-                  message)
+    return get_redactor(tuple(fields), redaction, separator).redact(message)
 
 
 class RedactingFormatter(logging.Formatter):
@@ -50,26 +169,192 @@ class RedactingFormatter(logging.Formatter):
     def __init__(self, fields: List[str]):
         super(RedactingFormatter, self).__init__(self.FORMAT)
         self.fields = fields
+        self.redactor = get_redactor(tuple(fields), self.REDACTION,
+                                     self.SEPARATOR)
 
     def format(self, record: logging.LogRecord) -> str:
-        """ Filters values in incoming records """
-        message = record.getMessage()
-        record.msg = filter_datum(self.fields, self.REDACTION, message,
-                                  self.SEPARATOR)
+        """ Filters values in incoming records
+
+        Structured records, logged with USER_ROW_FORMAT and a mapping of
+        arguments or with a `row` attribute set through `extra`, are
+        rendered with PII columns replaced by key. Any other message is
+        rendered and then scanned by the redactor.
+        """
+        row = self.structured_row(record)
+        if row is not None:
+            fields = self.redactor.fields
+            redaction = self.REDACTION
+            record.msg = self.SEPARATOR.join(
+                f"{key}={redaction if key in fields else value}"
+                for key, value in row)
+        else:
+            record.msg = self.redactor.redact(record.getMessage())
+        record.args = None
         return super().format(record)
 
+    @staticmethod
+    def structured_row(record: logging.LogRecord) -> Iterable[tuple]:
+        """ Returns the (column, value) pairs of a structured record
+
+        Args:
+            record (logging.LogRecord): Log record
+
+        Only records explicitly marked as rows are structured, so ordinary
+        `%(key)s` messages keep their text.
+
+        Returns:
+            (iterable of tuple): Pairs in column order, or None if the
+                record carries an unstructured message
+        """
+        if record.msg is USER_ROW_FORMAT and \
+                isinstance(record.args, Mapping):
+            return record.args.items()
+        row = getattr(record, 'row', None)
+        if row is None:
+            return None
+        if isinstance(row, Mapping):
+            return row.items()
+        return zip(getattr(record, 'columns', USER_COLUMNS), row)
+
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    """ Queue handler that enqueues structured records untouched
+
+    QueueHandler renders every message before enqueueing it, which would
+    turn a structured row back into a string for the listener to rescan.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """ Returns structured records as is, others prepared as usual """
+        if RedactingFormatter.structured_row(record) is not None:
+            return record
+        return super().prepare(record)
+
+
+class RedactingQueueListener():
+    """ Redacts and writes queued log records on a background thread
+
+    Records are drained from the queue in batches of up to `batch_size`,
+    formatted with a RedactingFormatter and written to the stream with a
+    single write and flush per batch. A record that fails to format, or a
+    batch that fails to write, is reported on stderr like
+    `logging.Handler.handleError` does, and the thread keeps running.
+    """
+    _sentinel = None
+
+    def __init__(self, log_queue: queue.SimpleQueue,
+                 formatter: logging.Formatter, stream=None,
+                 batch_size: int = 512):
+        self.queue = log_queue
+        self.formatter = formatter
+        self.stream = stream if stream is not None else sys.stderr
+        self.batch_size = batch_size
+        self._thread = None
 
-def get_logger() -> logging.Logger:
-    """ Returns a custom logger """
+    def start(self) -> None:
+        """ Starts the background thread """
+        self._thread = threading.Thread(target=self._monitor, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """ Flushes every queued record and stops the background thread """
+        if self._thread is None:
+            return
+        self.queue.put(self._sentinel)
+        self._thread.join()
+        self._thread = None
+
+    def _monitor(self) -> None:
+        """ Drains the queue until the sentinel is received """
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            done = False
+            lines = []
+            for record in batch:
+                if record is self._sentinel:
+                    done = True
+                    continue
+                try:
+                    lines.append(self.formatter.format(record) + '\n')
+                except Exception:
+                    self.handle_error(record)
+            if lines:
+                try:
+                    self.stream.write(''.join(lines))
+                    self.stream.flush()
+                except Exception:
+                    self.handle_error(None)
+            if done:
+                return
+
+    @staticmethod
+    def handle_error(record: logging.LogRecord) -> None:
+        """ Reports the exception being handled, like
+        `logging.Handler.handleError`
+
+        Args:
+            record (logging.LogRecord): Record that failed, None if a whole
+                batch failed to write
+        """
+        if not logging.raiseExceptions or sys.stderr is None:
+            return
+        try:
+            sys.stderr.write('--- Logging error ---\n')
+            traceback.print_exc(file=sys.stderr)
+            if record is not None:
+                sys.stderr.write(f'Message: {record.msg!r}\n'
+                                 f'Arguments: {record.args}\n')
+        except OSError:
+            pass
+
+
+def get_logger(queued: bool = False) -> logging.Logger:
+    """ Returns a custom logger
+
+    Calling it again with the same `queued` returns the same logger
+    without adding handlers. With a different `queued`, the handlers are
+    replaced, and the queue of a previous listener is flushed first.
+
+    Args:
+        queued (bool): If True, log calls only enqueue the record, and a
+            RedactingQueueListener redacts and writes it in the background.
+            The queue is flushed when the process exits.
+
+    Returns:
+        (logging.Logger): `user_data` logger
+    """
     # Create logger
     logger = logging.getLogger('user_data')
+    if logger.handlers:
+        if all(isinstance(handler, StructuredQueueHandler) == queued
+               for handler in logger.handlers):
+            return logger
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            listener = getattr(handler, 'listener', None)
+            if listener is not None:
+                listener.stop()
+            handler.close()
     logger.setLevel(logging.INFO)
     logger.propagate = False  # Prevent propagation to other handlers
 
     # Create and configure handler
-    handler = logging.StreamHandler()
     formatter = RedactingFormatter(PII_FIELDS)
-    handler.setFormatter(formatter)
+    if queued:
+        log_queue = queue.SimpleQueue()
+        handler = StructuredQueueHandler(log_queue)
+        listener = RedactingQueueListener(log_queue, formatter)
+        listener.start()
+        atexit.register(listener.stop)
+        handler.listener = listener
+    else:
+        handler = logging.StreamHandler()
+        handler.setFormatter(formatter)
 
     # Add handler to logger
     logger.addHandler(handler)
@@ -77,10 +362,33 @@ def get_logger() -> logging.Logger:
     return logger
 
 
-def get_db() -> mysql.connector.connection.MySQLConnection:
-    """ Returns a database connector """
+_pool = None
+_pool_pid = None
+_forked_pools = []
+
+
+def connect_db():
+    """ Opens a new connection to the configured database backend
+
+    `PERSONAL_DATA_DB_BACKEND` selects `mysql` (default) or `sqlite`. With
+    SQLite, `PERSONAL_DATA_DB_NAME` is the database file, and a missing
+    `users` table is loaded from `PERSONAL_DATA_DB_CSV` (the bundled
+    `user_data.csv` by default).
+
+    Returns:
+        Connection with the mysql.connector interface
+    """
     # Get database configurations
+    backend = environ.get("PERSONAL_DATA_DB_BACKEND", "mysql")
     db = environ.get("PERSONAL_DATA_DB_NAME")
+
+    if backend == "sqlite":
+        connector = SQLiteConnection(db or ":memory:")
+        csv_path = environ.get("PERSONAL_DATA_DB_CSV", os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "user_data.csv"))
+        load_users_csv(connector, csv_path)
+        return connector
+
     user = environ.get("PERSONAL_DATA_DB_USERNAME", "root")
     password = environ.get("PERSONAL_DATA_DB_PASSWORD", "")
     host = environ.get("PERSONAL_DATA_DB_HOST", "localhost")
@@ -92,26 +400,231 @@ def get_db() -> mysql.connector.connection.MySQLConnection:
     return connector
 
 
-def main() -> None:
-    """ Main function """
-    # Connect to database
-    db = get_db()
+def get_pool() -> ConnectionPool:
+    """ Returns this process's connection pool
+
+    Sized by `PERSONAL_DATA_DB_POOL_SIZE` (default 5), with a checkout
+    timeout of `PERSONAL_DATA_DB_POOL_TIMEOUT` seconds (default 30). A
+    forked worker gets a pool of its own; the connections it inherited are
+    kept referenced but never used, so their sockets stay open for the
+    parent.
+    """
+    global _pool, _pool_pid
+
+    if _pool is None or _pool_pid != os.getpid():
+        if _pool is not None:
+            _forked_pools.append(_pool)
+        _pool = ConnectionPool(
+            connect_db,
+            size=int(environ.get("PERSONAL_DATA_DB_POOL_SIZE", 5)),
+            timeout=float(environ.get("PERSONAL_DATA_DB_POOL_TIMEOUT", 30)))
+        _pool_pid = os.getpid()
+
+    return _pool
+
+
+def get_db() -> PooledConnection:
+    """ Returns a database connector checked out of the connection pool
+
+    Closing it returns the underlying connection to the pool.
+    """
+    return get_pool().get()
+
+
+def fetch_rows(cursor, batch_size: int) -> Iterator[tuple]:
+    """ Yields rows from an executed cursor, `batch_size` rows at a time
+
+    Args:
+        cursor: Cursor on which a query was executed
+        batch_size (int): Number of rows to fetch per round trip
+
+    Yields:
+        (tuple): One row of the result set
+    """
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def partition_bounds(db, partitions: int) -> List[tuple]:
+    """ Splits the `users` table into `last_login` ranges of similar size
+
+    Args:
+        db: Database connector
+        partitions (int): Number of ranges to produce
+
+    Returns:
+        (list of tuple): (low, high) bounds, where low is inclusive, high is
+            exclusive and None means unbounded. Rows with a NULL
+            `last_login` belong to the first range.
+    """
     cursor = db.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*) FROM users;")
+        total = cursor.fetchone()[0]
+        cuts = []
+        for i in range(1, partitions):
+            cursor.execute("SELECT last_login FROM users "
+                           "WHERE last_login IS NOT NULL "
+                           "ORDER BY last_login LIMIT 1 OFFSET %s;",
+                           (total * i // partitions,))
+            row = cursor.fetchone()
+            if row and (not cuts or row[0] != cuts[-1]):
+                cuts.append(row[0])
+    finally:
+        cursor.close()
+
+    bounds = [None] + cuts + [None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def export_partition(index: int, low, high, out_dir: str,
+                     batch_size: int) -> Tuple[str, int]:
+    """ Redacts one `last_login` range of `users` into its own file
+
+    Runs in a worker process, on its own database connection.
+
+    Args:
+        index (int): Partition number, used to name the output file
+        low: Inclusive lower bound, or None
+        high: Exclusive upper bound, or None
+        out_dir (str): Directory for the partition file
+        batch_size (int): Rows fetched per round trip
+
+    Returns:
+        (tuple): Path of the partition file and number of rows written
+    """
+    conditions = []
+    params = []
+    if low is not None:
+        conditions.append("last_login >= %s")
+        params.append(low)
+    if high is not None:
+        conditions.append("(last_login < %s OR last_login IS NULL)"
+                          if low is None else "last_login < %s")
+        params.append(high)
+    query = "SELECT * FROM users"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY last_login;"
+
+    formatter = RedactingFormatter(PII_FIELDS)
+    file_path = os.path.join(out_dir, f"users.part{index:04d}.log")
+    count = 0
+    db = get_db()
+    cursor = db.cursor(buffered=False)
+    try:
+        cursor.execute(query, tuple(params))
+        with open(file_path, 'w') as f:
+            for row in fetch_rows(cursor, batch_size):
+                record = logging.LogRecord('user_data', logging.INFO, None,
+                                           None, USER_ROW_FORMAT,
+                                           (dict(zip(USER_COLUMNS, row)),),
+                                           None)
+                f.write(formatter.format(record) + '\n')
+                count += 1
+    finally:
+        cursor.close()
+        db.close()
+
+    return file_path, count
+
+
+def parallel_export(workers: int, batch_size: int, output=None) -> int:
+    """ Exports `users` redacted, one `last_login` range per worker process
+
+    Each worker writes its range to a partition file; the files are then
+    concatenated into `output` in range order.
+
+    Args:
+        workers (int): Number of worker processes and partitions
+        batch_size (int): Rows fetched per round trip
+        output: Stream the merged export is written to, stderr by default
+
+    Returns:
+        (int): Number of rows exported
+    """
+    output = output if output is not None else sys.stderr
+    db = get_db()
+    try:
+        bounds = partition_bounds(db, workers)
+    finally:
+        db.close()
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(export_partition, i, low, high,
+                                       out_dir, batch_size)
+                       for i, (low, high) in enumerate(bounds)]
+            results = [future.result() for future in futures]
+
+        count = 0
+        for file_path, rows in results:
+            with open(file_path, 'r') as f:
+                shutil.copyfileobj(f, output)
+            count += rows
+    output.flush()
+
+    return count
+
+
+def report_stats(count: int, start: float) -> None:
+    """ Prints rows, rows/sec and peak RSS of this process and its workers
+
+    Args:
+        count (int): Number of rows processed
+        start (float): `time.perf_counter()` at the start of the run
+    """
+    elapsed = time.perf_counter() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    workers_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    print(f"rows={count} rows/sec={count / elapsed if elapsed else 0:.0f} "
+          f"peak_rss={peak_rss}KB workers_peak_rss={workers_rss}KB",
+          file=sys.stderr)
+
+
+def main(batch_size: int = None, workers: int = None) -> None:
+    """ Main function
+
+    Streams the `users` table through the logger in batches, so memory use
+    stays constant whatever the size of the table, then reports peak RSS
+    and rows/sec on stderr.
+
+    Args:
+        batch_size (int): Rows fetched per round trip. Defaults to the
+            `PERSONAL_DATA_BATCH_SIZE` environment variable, or 1000.
+        workers (int): Number of worker processes. Defaults to the
+            `PERSONAL_DATA_EXPORT_WORKERS` environment variable, or 1. With
+            more than one, the export runs through `parallel_export`.
+    """
+    if batch_size is None:
+        batch_size = int(environ.get("PERSONAL_DATA_BATCH_SIZE", 1000))
+    if workers is None:
+        workers = int(environ.get("PERSONAL_DATA_EXPORT_WORKERS", 1))
+
+    start = time.perf_counter()
+    if workers > 1:
+        count = parallel_export(workers, batch_size)
+        report_stats(count, start)
+        return
+
+    # Connect to database, unbuffered so rows stay on the server until
+    # they are fetched
+    db = get_db()
+    cursor = db.cursor(buffered=False)
 
     # Get logger
     logger = get_logger()
 
-    # Retrieve users from database
+    # Stream users from database
+    count = 0
     try:
         cursor.execute("SELECT * FROM users;")
-        users = cursor.fetchall()
-        for row in users:
-            # Reconstruct message
-            # name, email, phone, ssn, password, ip, last_login, user_agent
-            message = (f"name={row[0]};email={row[1]};phone={row[2]};"
-                       + f"ssn={row[3]};password={row[4]};ip={row[5]};"
-                       + f"last_login={row[6]};user_agent={row[7]}")
-            logger.info(message)
+        for row in fetch_rows(cursor, batch_size):
+            logger.info(USER_ROW_FORMAT, dict(zip(USER_COLUMNS, row)))
+            count += 1
     except Exception as e:
         logger.exception({e})
     finally:
@@ -119,6 +632,8 @@ def main() -> None:
         cursor.close()
         db.close()
 
+    report_stats(count, start)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+""" Redacts existing log files with the filtered_logger rules
+
+The input file is memory-mapped and split into chunks on newline
+boundaries. Worker processes redact the chunks as raw bytes, and the
+results are written to the output in input order while at most two
+chunks per worker are in flight. Throughput is reported on stderr.
+
+Usage:
+    ./redact_logs.py input.log [-o output.log] [-w workers]
+                     [-f name,email,...] [-s ';'] [-c chunk_mb]
+
+Functions:
+    chunk_bounds() - Splits a mapped file into newline-aligned chunks
+    redact_line() - Redacts one log line
+    redact_chunk() - Redacts one chunk of a file
+    redact_file() - Redacts a whole file in parallel
+"""
+import argparse
+import mmap
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Iterator, Tuple
+
+from filtered_logger import PII_FIELDS, RedactingFormatter, get_redactor
+
+
+def chunk_bounds(mm: mmap.mmap, chunk_size: int) -> Iterator[Tuple[int, int]]:
+    """ Yields (start, end) offsets of chunks ending on a newline
+
+    Args:
+        mm (mmap.mmap): Mapped file
+        chunk_size (int): Approximate chunk size in bytes
+
+    Yields:
+        (tuple): Start and end offsets, the end being exclusive
+    """
+    size = len(mm)
+    start = 0
+    while start < size:
+        end = mm.find(b'\n', min(start + chunk_size, size) - 1)
+        end = size if end == -1 else end + 1
+        yield start, end
+        start = end
+
+
+def redact_line(redactor, line: bytes) -> bytes:
+    """ Redacts one log line
+
+    Args:
+        redactor (Redactor): Bytes redactor
+        line (bytes): Log line without its newline
+
+    Returns:
+        (bytes): Redacted line
+    """
+    return redactor.redact(line)
+
+
+def redact_chunk(file_path: str, start: int, end: int, fields: tuple,
+                 redaction: bytes, separator: bytes) -> bytes:
+    """ Redacts bytes `start` to `end` of a file
+
+    Runs in a worker process, which maps the file itself so that only the
+    offsets and the redacted output cross process boundaries.
+
+    Returns:
+        (bytes): Redacted chunk
+    """
+    redactor = get_redactor(fields, redaction, separator)
+    with open(file_path, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        data = mm[start:end]
+    return b'\n'.join(redact_line(redactor, line)
+                      for line in data.split(b'\n'))
+
+
+def redact_file(file_path: str, output: BinaryIO, fields: tuple,
+                redaction: bytes, separator: bytes, workers: int,
+                chunk_size: int) -> int:
+    """ Redacts a whole file in parallel and writes it to `output` in order
+
+    Returns:
+        (int): Number of input bytes processed
+    """
+    if os.path.getsize(file_path) == 0:
+        return 0
+
+    with open(file_path, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+            ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for start, end in chunk_bounds(mm, chunk_size):
+            pending.append(executor.submit(redact_chunk, file_path, start,
+                                           end, fields, redaction,
+                                           separator))
+            if len(pending) >= 2 * workers:
+                output.write(pending.popleft().result())
+        while pending:
+            output.write(pending.popleft().result())
+        size = len(mm)
+    output.flush()
+
+    return size
+
+
+def main() -> None:
+    """ Parses arguments, redacts the file and reports throughput """
+    parser = argparse.ArgumentParser(
+        description="Redact PII fields from existing log files")
+    parser.add_argument("input", help="log file to redact")
+    parser.add_argument("-o", "--output",
+                        help="redacted file, stdout by default")
+    parser.add_argument("-w", "--workers", type=int,
+                        default=os.cpu_count() or 1,
+                        help="worker processes, one per core by default")
+    parser.add_argument("-f", "--fields", default=",".join(PII_FIELDS),
+                        help="comma separated fields to redact")
+    parser.add_argument("-s", "--separator",
+                        default=RedactingFormatter.SEPARATOR,
+                        help="separator of fields in log messages")
+    parser.add_argument("-c", "--chunk-mb", type=float, default=4,
+                        help="chunk size in MB")
+    args = parser.parse_args()
+
+    fields = tuple(field.encode() for field in args.fields.split(","))
+    redaction = RedactingFormatter.REDACTION.encode()
+    separator = args.separator.encode()
+    chunk_size = max(int(args.chunk_mb * 1024 * 1024), 1)
+
+    start = time.perf_counter()
+    if args.output:
+        with open(args.output, 'wb') as output:
+            size = redact_file(args.input, output, fields, redaction,
+                               separator, args.workers, chunk_size)
+    else:
+        size = redact_file(args.input, sys.stdout.buffer, fields, redaction,
+                           separator, args.workers, chunk_size)
+    elapsed = time.perf_counter() - start
+
+    mb_per_sec = size / (1024 * 1024) / elapsed if elapsed else 0
+    print(f"bytes={size} MB/s={mb_per_sec:.1f} "
+          f"MB/s/core={mb_per_sec / args.workers:.1f}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
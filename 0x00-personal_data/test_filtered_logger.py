@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests of filtered_logger
+"""
+import contextlib
+import io
+import logging
+import queue
+import unittest
+
+from filtered_logger import (RedactingFormatter, RedactingQueueListener,
+                             Redactor, StructuredQueueHandler, filter_datum,
+                             get_logger)
+
+
+class TestFilterDatum(unittest.TestCase):
+    """ Tests of filter_datum """
+    def test_delimiters(self):
+        """ Keys after any non word character are redacted """
+        cases = [
+            ("user=bob,password=hunter2 ok", "user=bob,password=***"),
+            ("?u=b&password=x", "?u=b&password=***"),
+            ('"password=x', '"password=***'),
+            ("x:password=x", "x:password=***"),
+            ("[prefix] password=x;", "[prefix] password=***;"),
+            ("password=x;", "password=***;"),
+        ]
+        for message, expected in cases:
+            with self.subTest(message=message):
+                self.assertEqual(
+                    filter_datum(["password"], "***", message, ";"),
+                    expected)
+
+    def test_key_inside_word(self):
+        """ A key preceded by a word character is not redacted """
+        self.assertEqual(
+            filter_datum(["name"], "***", "username=a;name=b;", ";"),
+            "username=a;name=***;")
+
+    def test_bytes(self):
+        """ Bytes messages are redacted like str messages """
+        redactor = Redactor((b"password",), b"***", b";")
+        self.assertEqual(redactor.redact(b"a=1,password=x;b=2"),
+                         b"a=1,password=***;b=2")
+        self.assertEqual(redactor.redact(b"mypassword=x;"),
+                         b"mypassword=x;")
+
+
+class TestGetLogger(unittest.TestCase):
+    """ Tests of get_logger """
+    def tearDown(self):
+        """ Removes the handlers of `user_data` """
+        get_logger(queued=False)
+        logger = logging.getLogger('user_data')
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+
+    def test_same_mode(self):
+        """ The handlers are kept when `queued` does not change """
+        handlers = list(get_logger(queued=True).handlers)
+        self.assertEqual(get_logger(queued=True).handlers, handlers)
+
+    def test_mode_change(self):
+        """ The handlers are replaced when `queued` changes """
+        logger = get_logger(queued=True)
+        listener = logger.handlers[0].listener
+        logger = get_logger(queued=False)
+        self.assertEqual(len(logger.handlers), 1)
+        self.assertNotIsInstance(logger.handlers[0], StructuredQueueHandler)
+        self.assertIsNone(listener._thread)
+        logger = get_logger(queued=True)
+        self.assertEqual(len(logger.handlers), 1)
+        self.assertIsInstance(logger.handlers[0], StructuredQueueHandler)
+
+
+class TestRedactingQueueListener(unittest.TestCase):
+    """ Tests of RedactingQueueListener """
+    def test_bad_record(self):
+        """ A record failing to format is reported and skipped """
+        log_queue = queue.SimpleQueue()
+        stream = io.StringIO()
+        listener = RedactingQueueListener(
+            log_queue, RedactingFormatter(["password"]), stream)
+        listener.start()
+        bad = logging.makeLogRecord({"msg": "%d", "args": ("x",)})
+        good = logging.makeLogRecord({"msg": "password=x;"})
+        errors = io.StringIO()
+        with contextlib.redirect_stderr(errors):
+            log_queue.put(bad)
+            log_queue.put(good)
+            listener.stop()
+        self.assertIn("password=***;", stream.getvalue())
+        self.assertIn("--- Logging error ---", errors.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
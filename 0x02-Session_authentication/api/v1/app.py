@@ -3,6 +3,7 @@
 Route module for the API
 """
 from os import getenv
+from api.v1.auth.path_matcher import PathMatcher
 from api.v1.views import app_views
 from flask import Flask, jsonify, abort, request
 from flask_cors import (CORS, cross_origin)
@@ -26,6 +27,23 @@ elif auth_type == 'basic_auth':
 elif auth_type == 'session_auth':
     from api.v1.auth.session_auth import SessionAuth
     auth = SessionAuth()
+elif auth_type == 'session_exp_auth':
+    from api.v1.auth.session_exp_auth import SessionExpAuth
+    auth = SessionExpAuth()
+elif auth_type == 'auth_chain':
+    from api.v1.auth.auth_chain import AuthChain
+    auth = AuthChain()
+
+# Views read the auth instance from the app: under `python3 -m api.v1.app`
+# the module runs as __main__, and importing api.v1.app would build a
+# second, idle instance
+app.config["AUTH"] = auth
+
+# Paths excluded from authentication, compiled once
+EXCLUDED_PATHS = PathMatcher(['/api/v1/status/',
+                              '/api/v1/unauthorized/',
+                              '/api/v1/forbidden/',
+                              '/api/v1/auth_session/login/'])
 
 
 @app.before_request
@@ -34,13 +52,7 @@ def before_request() -> str:
     if not auth:
         return
 
-    # Paths excluded from authentication
-    excluded_paths = ['/api/v1/status/',
-                      '/api/v1/unauthorized/',
-                      '/api/v1/forbidden/',
-                      '/api/v1/auth_session/login/']
-
-    auth_status = auth.require_auth(request.path, excluded_paths)
+    auth_status = auth.require_auth(request.path, EXCLUDED_PATHS)
 
     # Do nothing if authentication is not required
     if not auth_status:
@@ -8,43 +8,51 @@ Classes:
 Functions:
     session_cookie: Returns a cookie value from a request
 """
+from api.v1.auth.path_matcher import PathMatcher
 from flask import request
+from functools import lru_cache
 from os import getenv
-from typing import List, TypeVar
+from typing import List, TypeVar, Union
+
+
+@lru_cache(maxsize=32)
+def compile_excluded_paths(excluded_paths: tuple) -> PathMatcher:
+    """ Returns the PathMatcher of a tuple of exclusion rules """
+    return PathMatcher(excluded_paths)
 
 
 class Auth():
     """ Template for API authentication system """
-    def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
+    def require_auth(self, path: str,
+                     excluded_paths: Union[List[str], PathMatcher]) -> bool:
         """ Checks if authentication is required for a given path.
 
-        Compares a path with a list of paths which are excluded from
+        Compares a path with the paths which are excluded from
         authentication.
-        - If `path` is present in `excluded_paths`, False is returned
+        - If `path` matches `excluded_paths`, False is returned
         indicating that path is excluded.
-        - If `path` is not present in `excluded_paths`, True is
+        - If `path` does not match `excluded_paths`, True is
         returned indicating that path is not excluded from auth.
 
+        A rule ending with `*` excludes every path starting with the rest
+        of it. Pass a PathMatcher compiled once to avoid recompiling the
+        rules; a list is compiled on first use and cached.
+
         Args:
             path(str): Path to validate
-            excluded_paths(list of str): Paths excluded from authentication
+            excluded_paths(list of str or PathMatcher): Paths excluded from
+                authentication
 
         Return:
             (bool): True if authentication is required, otherwise, False.
         """
         if not path or not excluded_paths:
             return True
-        if len(excluded_paths) == 0:
-            return True
 
-        # Normalized path
-        normalized_path = path.rstrip('/')
-        for exluded_path in excluded_paths:
-            # Check if the normalized path matches the excluded path
-            if exluded_path.rstrip('/') == normalized_path:
-                return False
+        if not isinstance(excluded_paths, PathMatcher):
+            excluded_paths = compile_excluded_paths(tuple(excluded_paths))
 
-        return True
+        return not excluded_paths.matches(path)
 
     def authorization_header(self, request=None) -> str:
         """ Retrieve authorization header from request
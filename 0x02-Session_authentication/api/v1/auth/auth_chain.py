@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Handles authentication through several strategies
+
+Classes:
+    AuthChain: Tries authentication strategies in order
+"""
+from api.v1.auth.auth import Auth
+from importlib import import_module
+from os import getenv
+from typing import List, TypeVar
+import threading
+import time
+
+
+# AUTH_CHAIN names of the strategies, with their module and class
+STRATEGIES = {
+    'auth': ('api.v1.auth.auth', 'Auth'),
+    'basic_auth': ('api.v1.auth.basic_auth', 'BasicAuth'),
+    'session_auth': ('api.v1.auth.session_auth', 'SessionAuth'),
+    'session_exp_auth': ('api.v1.auth.session_exp_auth', 'SessionExpAuth'),
+}
+
+
+class AuthChain(Auth):
+    """ Tries authentication strategies in order
+
+    The strategies are listed by name in AUTH_CHAIN, cheapest first: the
+    default `session_auth,basic_auth` looks the session cookie up before
+    verifying Basic credentials. The first user found is returned.
+
+    Hits, misses and the time spent are counted per strategy. Attributes
+    the chain lacks, such as `create_session`, are looked up on the
+    strategies in order.
+    """
+    def __init__(self, names: List[str] = None):
+        """ Initializes an AuthChain
+
+        Args:
+            names(list of str): Names of the strategies, read from
+                AUTH_CHAIN if None
+        """
+        if names is None:
+            names = getenv('AUTH_CHAIN', 'session_auth,basic_auth').split(',')
+        self.strategies = []
+        for name in names:
+            name = name.strip()
+            if name not in STRATEGIES:
+                raise ValueError("Unknown auth strategy: {}".format(name))
+            module_name, class_name = STRATEGIES[name]
+            strategy = getattr(import_module(module_name), class_name)()
+            self.strategies.append((name, strategy))
+        self._lock = threading.Lock()
+        self._counters = {name: [0, 0, 0] for name, _ in self.strategies}
+
+    def __getattr__(self, attribute: str):
+        """ Returns the attribute of the first strategy having it """
+        for _, strategy in self.__dict__.get('strategies', ()):
+            if hasattr(strategy, attribute):
+                return getattr(strategy, attribute)
+        raise AttributeError(attribute)
+
+    def current_user(self, request=None) -> TypeVar('User'):
+        """ Returns the user of the first strategy authenticating the request
+
+        Args:
+            request (obj): Request object
+
+        Returns:
+            (obj): User object
+        """
+        if not request:
+            return
+
+        for name, strategy in self.strategies:
+            start = time.perf_counter_ns()
+            user = strategy.current_user(request)
+            elapsed = time.perf_counter_ns() - start
+            with self._lock:
+                counters = self._counters[name]
+                counters[0 if user else 1] += 1
+                counters[2] += elapsed
+            if user:
+                return user
+
+    def stats(self) -> List[dict]:
+        """ Returns the hits, misses and average latency of each strategy,
+        in order
+        """
+        with self._lock:
+            stats = []
+            for name, _ in self.strategies:
+                hits, misses, elapsed = self._counters[name]
+                calls = hits + misses
+                stats.append({
+                    "strategy": name,
+                    "hits": hits,
+                    "misses": misses,
+                    "avg_us": elapsed / calls / 1000 if calls else 0.0,
+                })
+            return stats
@@ -4,13 +4,25 @@ Handles Basic Authentication
 """
 import base64
 from api.v1.auth.auth import Auth
+from api.v1.auth.credential_cache import CredentialCache
 from models.base import DATA
 from models.user import User
+from os import getenv
 from typing import Tuple, TypeVar
 
 
 class BasicAuth(Auth):
-    """ Handles Basic Authentication """
+    """ Handles Basic Authentication
+
+    Verified headers are cached for BASIC_AUTH_CACHE_TTL seconds (0
+    disables the cache), up to BASIC_AUTH_CACHE_SIZE of them.
+    """
+    def __init__(self):
+        """ Initializes a BasicAuth instance """
+        self.credential_cache = CredentialCache(
+            float(getenv('BASIC_AUTH_CACHE_TTL', 60)),
+            int(getenv('BASIC_AUTH_CACHE_SIZE', 10000)))
+
     def extract_base64_authorization_header(self,
                                             authorization_header: str) -> str:
         """ Returns the Base64 part of the Authorization header
@@ -103,10 +115,9 @@ class BasicAuth(Auth):
             return
 
         try:
-            users = User.search({"email": user_email})
-            # Assume emails are unique, we ar extracting the first match
-            user = users[0]
-            if user.is_valid_password(user_pwd):
+            # Assume emails are unique, we are extracting the first match
+            user = User.query({"email": user_email}).first()
+            if user is not None and user.is_valid_password(user_pwd):
                 return user
         except Exception:
             return
@@ -126,6 +137,16 @@ class BasicAuth(Auth):
         if not authorization_header:
             return
 
+        # Return the cached user if the header was verified recently and
+        # the user still exists with the same password
+        user_id = self.credential_cache.get(authorization_header)
+        if user_id is not None:
+            user = User.get(user_id)
+            if user is None:
+                self.credential_cache.invalidate_user(user_id)
+            elif self.credential_cache.check(user_id, user.password):
+                return user
+
         # Extract base64 part of authorization header
         base64_part = self.extract_base64_authorization_header(
             authorization_header)
@@ -144,5 +165,8 @@ class BasicAuth(Auth):
 
         # Get user object from database using email and password
         user = self.user_object_from_credentials(user_email, user_pwd)
+        if user is not None:
+            self.credential_cache.put(authorization_header, user.id,
+                                      user.password)
 
         return user
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Cache of verified Basic credentials
+
+Classes:
+    CredentialCache: Maps Authorization headers to the users they verified
+"""
+from collections import OrderedDict
+from typing import Optional
+import hashlib
+import hmac
+import os
+import threading
+import time
+
+
+class CredentialCache():
+    """ Short-lived cache of Authorization headers already verified
+
+    Headers are keyed by their keyed BLAKE2b digest under a random
+    per-process key, so neither the header nor the password is kept. Each
+    entry maps to the ID of the user it verified and expires after `ttl`
+    seconds; at most `maxsize` entries are kept, least recently used first
+    out.
+
+    A fingerprint of the stored password hash is kept per user. Callers
+    pass the current hash to `check`, which drops every entry of the user
+    when it changed; a removed user is dropped with `invalidate_user`.
+    """
+
+    def __init__(self, ttl: float, maxsize: int):
+        """ Initialize a CredentialCache
+
+        Args:
+            ttl(float): Lifetime of an entry in seconds, 0 disables caching
+            maxsize(int): Maximum number of entries
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._secret = os.urandom(32)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._fingerprints = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lookup_ns = 0
+
+    def _digest(self, value: str) -> bytes:
+        """ Returns the keyed digest of a value
+        """
+        return hashlib.blake2b(value.encode('utf-8'), key=self._secret,
+                               digest_size=32).digest()
+
+    def get(self, authorization_header: str) -> Optional[str]:
+        """ Returns the ID of the user a header verified, if still cached
+
+        Args:
+            authorization_header(str): Raw Authorization header
+
+        Returns:
+            (str): User ID, or None on a miss
+        """
+        if self.ttl <= 0:
+            return
+        start = time.perf_counter_ns()
+        key = self._digest(authorization_header)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] < time.monotonic():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            self._lookup_ns += time.perf_counter_ns() - start
+        return entry[0] if entry is not None else None
+
+    def put(self, authorization_header: str, user_id: str,
+            password_hash: str):
+        """ Caches a header verified for a user
+
+        Args:
+            authorization_header(str): Raw Authorization header
+            user_id(str): ID of the user it verified
+            password_hash(str): Stored password hash of the user
+        """
+        if self.ttl <= 0:
+            return
+        key = self._digest(authorization_header)
+        fingerprint = self._digest(password_hash or "")
+        with self._lock:
+            if self._fingerprints.get(user_id, fingerprint) != fingerprint:
+                self._drop_user(user_id)
+            self._drop(key)
+            self._entries[key] = (user_id, time.monotonic() + self.ttl)
+            self._keys_by_user.setdefault(user_id, set()).add(key)
+            self._fingerprints[user_id] = fingerprint
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+
+    def check(self, user_id: str, password_hash: str) -> bool:
+        """ Checks that a user's password did not change since cached
+
+        Every entry of the user is dropped if it did.
+
+        Returns:
+            (bool): True if the cached entries of the user are current
+        """
+        fingerprint = self._digest(password_hash or "")
+        with self._lock:
+            if hmac.compare_digest(self._fingerprints.get(user_id, b""),
+                                   fingerprint):
+                return True
+            self._drop_user(user_id)
+            return False
+
+    def invalidate_user(self, user_id: str):
+        """ Drops every entry of a user
+        """
+        with self._lock:
+            self._drop_user(user_id)
+
+    def _drop(self, key: bytes):
+        """ Drops one entry, with the lock held
+        """
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._keys_by_user.get(entry[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[entry[0]]
+                self._fingerprints.pop(entry[0], None)
+
+    def _drop_user(self, user_id: str):
+        """ Drops every entry of a user, with the lock held
+        """
+        keys = self._keys_by_user.pop(user_id, ())
+        for key in keys:
+            self._entries.pop(key, None)
+        self._fingerprints.pop(user_id, None)
+        if keys:
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        """ Returns the hit rate and average lookup latency
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "avg_lookup_us": (self._lookup_ns / lookups / 1000
+                                  if lookups else 0.0),
+            }
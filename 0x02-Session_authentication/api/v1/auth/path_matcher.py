@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Matches request paths against authentication exclusion rules
+
+Classes:
+    PathMatcher: Exclusion rules compiled once, matched in O(len(path))
+"""
+from functools import lru_cache
+from typing import Iterable
+
+
+class PathMatcher():
+    """ Exclusion rules compiled once
+
+    A rule ending with `*` is a prefix rule: it matches every path
+    starting with the rest of it, so `/api/v1/stat*` matches
+    `/api/v1/status` and `/api/v1/stats`. Any other rule matches a path
+    equal to it, a trailing slash on either side being ignored.
+
+    Exact rules are a set and prefix rules a character trie, so a match
+    costs the same however many rules there are. Results of the last
+    `cache_size` distinct paths are cached.
+    """
+    _END = ""
+
+    def __init__(self, rules: Iterable[str], cache_size: int = 1024):
+        """ Compiles the rules
+
+        Args:
+            rules(iterable of str): Exclusion rules
+            cache_size(int): Number of paths whose result is cached
+        """
+        self.rules = tuple(rules)
+        self._exact = set()
+        self._trie = {}
+        for rule in self.rules:
+            if rule.endswith('*'):
+                node = self._trie
+                for char in rule[:-1]:
+                    node = node.setdefault(char, {})
+                node[self._END] = True
+            else:
+                self._exact.add(rule.rstrip('/'))
+        self.matches = lru_cache(maxsize=cache_size)(self._match)
+
+    def _match(self, path: str) -> bool:
+        """ Checks whether a path matches one of the rules
+
+        Args:
+            path(str): Request path
+
+        Returns:
+            (bool): True if the path is excluded
+        """
+        if path.rstrip('/') in self._exact:
+            return True
+        node = self._trie
+        if self._END in node:
+            return True
+        for char in path:
+            node = node.get(char)
+            if node is None:
+                return False
+            if self._END in node:
+                return True
+        return False
+
+    def __len__(self) -> int:
+        return len(self.rules)
@@ -4,14 +4,31 @@ Handles Session Authentication
 """
 import uuid
 from api.v1.auth.auth import Auth
+from api.v1.auth.session_store import session_store
+from datetime import datetime
 from models.user import User
 from typing import TypeVar
 
 
 class SessionAuth(Auth):
-    """ Class for session authentication """
+    """ Class for session authentication
+
+    Sessions are kept in the SESSION_STORE store: "memory" (the default,
+    `user_id_by_session_id`), "sqlite" or "model".
+    """
     user_id_by_session_id = {}
 
+    def __init__(self):
+        """ Initializes a SessionAuth instance """
+        self.session_store = session_store(
+            sessions=self.user_id_by_session_id)
+
+    def session_created_at(self) -> datetime:
+        """ Returns the creation time to store with a new session, None as
+        sessions do not expire
+        """
+        return None
+
     def create_session(self, user_id: str = None) -> str:
         """ Creates a session for a user ID
 
@@ -25,7 +42,8 @@ class SessionAuth(Auth):
             return
 
         session_id = str(uuid.uuid4())
-        self.user_id_by_session_id[session_id] = user_id
+        self.session_store.create(session_id, user_id,
+                                  self.session_created_at())
 
         return session_id
 
@@ -40,9 +58,11 @@ class SessionAuth(Auth):
         """
         if not isinstance(session_id, str):
             return
-        user_id = self.user_id_by_session_id.get(session_id)
+        session = self.session_store.get(session_id)
+        if session is None:
+            return
 
-        return user_id
+        return session["user_id"]
 
     def current_user(self, request=None) -> TypeVar('User'):
         """ Returns a User instance based on a cookie value
@@ -90,6 +110,4 @@ class SessionAuth(Auth):
             return False
 
         # Delete session ID
-        self.user_id_by_session_id.pop(session_id)
-
-        return True
+        return self.session_store.destroy(session_id)
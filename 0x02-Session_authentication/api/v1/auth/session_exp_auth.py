@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Handles Session Authentication with expiring sessions
+"""
+from api.v1.auth.session_auth import SessionAuth
+from datetime import datetime, timedelta
+from os import getenv
+
+
+class SessionExpAuth(SessionAuth):
+    """ Session authentication whose sessions expire
+
+    Sessions last SESSION_DURATION seconds, 0 or less meaning forever.
+    Each session is stored with its creation time, so a lookup rejects an
+    expired session in O(1).
+
+    Each login purges up to `SWEEP_BATCH` expired sessions, oldest first:
+    the memory store pops them off a heap in O(log n) each, the other
+    stores use an index on the creation time. Memory is therefore bounded
+    by the sessions created within one duration.
+    """
+    SWEEP_BATCH = 64
+
+    def __init__(self):
+        """ Initializes a SessionExpAuth instance """
+        super().__init__()
+        try:
+            self.session_duration = int(getenv('SESSION_DURATION', 0))
+        except ValueError:
+            self.session_duration = 0
+
+    @staticmethod
+    def now() -> datetime:
+        """ Returns the current time """
+        return datetime.now()
+
+    def session_created_at(self) -> datetime:
+        """ Returns the creation time to store with a new session """
+        return self.now()
+
+    def create_session(self, user_id: str = None) -> str:
+        """ Creates a session for a user ID, sweeping expired sessions
+
+        Args:
+            user_id(str): User ID
+
+        Returns:
+            (str): Newly created session's ID
+        """
+        session_id = super().create_session(user_id)
+        if session_id and self.session_duration > 0:
+            self.sweep(limit=self.SWEEP_BATCH)
+
+        return session_id
+
+    def sweep(self, now: datetime = None, limit: int = None) -> int:
+        """ Removes the sessions expired at `now`
+
+        Args:
+            now(datetime): Current time, read from the clock if None
+            limit(int): Maximum number of sessions examined
+
+        Returns:
+            (int): Number of sessions removed
+        """
+        if self.session_duration <= 0:
+            return 0
+        if now is None:
+            now = self.now()
+        return self.session_store.purge(
+            now - timedelta(seconds=self.session_duration), limit)
+
+    def user_id_for_session_id(self, session_id: str = None) -> str:
+        """ Returns the user ID of a session, unless it expired
+
+        Args:
+            session_id(str): Session ID
+
+        Returns:
+            (str): User ID associated with session ID
+        """
+        if not isinstance(session_id, str):
+            return
+        session = self.session_store.get(session_id)
+        if session is None:
+            return
+
+        if self.session_duration <= 0:
+            return session["user_id"]
+        created_at = session["created_at"]
+        if not created_at or created_at + timedelta(
+                seconds=self.session_duration) < self.now():
+            return
+
+        return session["user_id"]
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Storage of the sessions of SessionAuth
+
+Classes:
+    SessionStore: Interface of the session stores
+    MemorySessionStore: Sessions in a dict of the process
+    SQLiteSessionStore: Sessions in an SQLite file shared by processes
+    ModelSessionStore: Sessions as UserSession models
+"""
+from abc import ABC, abstractmethod
+from datetime import datetime
+from os import getenv
+from typing import Optional
+import heapq
+import sqlite3
+import threading
+
+
+class SessionStore(ABC):
+    """ Interface of the session stores
+
+    A session maps a session ID to a user ID and, when the caller tracks
+    expiry, to its creation time.
+    """
+    @abstractmethod
+    def create(self, session_id: str, user_id: str,
+               created_at: datetime = None):
+        """ Stores a session
+
+        Args:
+            session_id(str): Session ID
+            user_id(str): User ID
+            created_at(datetime): Creation time, if tracked
+        """
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[dict]:
+        """ Returns `{"user_id": ..., "created_at": ...}` of a session,
+        None if there is none
+        """
+
+    @abstractmethod
+    def destroy(self, session_id: str) -> bool:
+        """ Deletes a session
+
+        Returns:
+            (bool): True if the session existed
+        """
+
+    @abstractmethod
+    def purge(self, before: datetime, limit: int = None) -> int:
+        """ Deletes the sessions created before a time
+
+        Args:
+            before(datetime): Sessions created earlier are deleted
+            limit(int): Maximum number of sessions deleted, if any
+
+        Returns:
+            (int): Number of sessions deleted
+        """
+
+
+class MemorySessionStore(SessionStore):
+    """ Sessions in a dict of the process
+
+    A session without creation time is stored as its user ID, otherwise
+    as `{"user_id": ..., "created_at": ...}`. Creation times are pushed on
+    a heap, so a purge pops the oldest sessions in O(log n) each. Once
+    destroyed sessions make up most of the heap, it is rebuilt from the
+    sessions left.
+    """
+    def __init__(self, sessions: dict = None):
+        """ Initializes a MemorySessionStore
+
+        Args:
+            sessions(dict): Dict holding the sessions, by session ID
+        """
+        self.sessions = sessions if sessions is not None else {}
+        self._heap = []
+        self._lock = threading.Lock()
+
+    def create(self, session_id: str, user_id: str,
+               created_at: datetime = None):
+        """ Stores a session in the dict, and its creation time on the
+        heap
+        """
+        if created_at is None:
+            self.sessions[session_id] = user_id
+            return
+        self.sessions[session_id] = {
+            "user_id": user_id, "created_at": created_at}
+        with self._lock:
+            heapq.heappush(self._heap, (created_at, session_id))
+            if len(self._heap) > 2 * len(self.sessions) + 64:
+                self._heap = [
+                    (session["created_at"], session_id)
+                    for session_id, session in list(self.sessions.items())
+                    if isinstance(session, dict)]
+                heapq.heapify(self._heap)
+
+    def get(self, session_id: str) -> Optional[dict]:
+        """ Returns a session from the dict, None if there is none
+        """
+        session = self.sessions.get(session_id)
+        if session is None or isinstance(session, dict):
+            return session
+        return {"user_id": session, "created_at": None}
+
+    def destroy(self, session_id: str) -> bool:
+        """ Deletes a session from the dict, leaving its heap entry to be
+        skipped by purges
+        """
+        return self.sessions.pop(session_id, None) is not None
+
+    def purge(self, before: datetime, limit: int = None) -> int:
+        """ Deletes the sessions created before a time, popping them off
+        the heap
+
+        Heap entries of sessions already destroyed, or created again
+        since, count towards `limit` but delete nothing.
+        """
+        removed = 0
+        with self._lock:
+            heap = self._heap
+            while heap and heap[0][0] < before and limit != 0:
+                created_at, session_id = heapq.heappop(heap)
+                if limit is not None:
+                    limit -= 1
+                session = self.sessions.get(session_id)
+                if isinstance(session, dict) and \
+                        session.get("created_at") == created_at:
+                    del self.sessions[session_id]
+                    removed += 1
+        return removed
+
+    def __len__(self) -> int:
+        """ Returns the number of sessions """
+        return len(self.sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """ Sessions in an SQLite file, shared by the processes of the host
+
+    Each thread has its own connection and the database runs in WAL mode,
+    so lookups do not wait for logins. Creation times are indexed, so a
+    purge only reads the sessions it deletes.
+    """
+    TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+    def __init__(self, file_path: str):
+        """ Initializes an SQLiteSessionStore
+
+        Args:
+            file_path(str): Path of the database
+        """
+        self.file_path = file_path
+        self._local = threading.local()
+        conn = self.connection()
+        conn.execute("CREATE TABLE IF NOT EXISTS sessions ("
+                     "session_id TEXT PRIMARY KEY, user_id TEXT NOT NULL, "
+                     "created_at TEXT)")
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_created_at "
+                     "ON sessions (created_at)")
+
+    def connection(self) -> sqlite3.Connection:
+        """ Returns the connection of the current thread
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.file_path, isolation_level=None,
+                                   timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """ Closes the connection of the current thread
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def create(self, session_id: str, user_id: str,
+               created_at: datetime = None):
+        """ Inserts a session, replacing any with the same ID
+        """
+        if created_at is not None:
+            created_at = created_at.strftime(self.TIMESTAMP_FORMAT)
+        self.connection().execute(
+            "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+            (session_id, user_id, created_at))
+
+    def get(self, session_id: str) -> Optional[dict]:
+        """ Returns a session by its primary key, None if there is none
+        """
+        row = self.connection().execute(
+            "SELECT user_id, created_at FROM sessions WHERE session_id = ?",
+            (session_id,)).fetchone()
+        if row is None:
+            return None
+        user_id, created_at = row
+        if created_at is not None:
+            created_at = datetime.strptime(created_at, self.TIMESTAMP_FORMAT)
+        return {"user_id": user_id, "created_at": created_at}
+
+    def destroy(self, session_id: str) -> bool:
+        """ Deletes a session by its primary key
+        """
+        return self.connection().execute(
+            "DELETE FROM sessions WHERE session_id = ?",
+            (session_id,)).rowcount > 0
+
+    def purge(self, before: datetime, limit: int = None) -> int:
+        """ Deletes the oldest sessions created before a time, read
+        through the index on `created_at`
+        """
+        return self.connection().execute(
+            "DELETE FROM sessions WHERE session_id IN ("
+            "SELECT session_id FROM sessions WHERE created_at < ? "
+            "ORDER BY created_at LIMIT ?)",
+            (before.strftime(self.TIMESTAMP_FORMAT),
+             -1 if limit is None else limit)).rowcount
+
+    def __len__(self) -> int:
+        """ Returns the number of sessions """
+        return self.connection().execute(
+            "SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+class ModelSessionStore(SessionStore):
+    """ Sessions as UserSession models, persisted like any other model
+
+    UserSession indexes `session_id` for lookups and sorts `created_at`
+    for purges. The sessions are shared by processes when the models are
+    (MODELS_SHARED or MODELS_ENGINE=sqlite).
+    """
+    def __init__(self):
+        """ Initializes a ModelSessionStore, loading the sessions
+        """
+        from models.user_session import UserSession
+        self.model = UserSession
+        UserSession.load_from_file()
+
+    def create(self, session_id: str, user_id: str,
+               created_at: datetime = None):
+        """ Saves a UserSession
+        """
+        self.model(session_id=session_id, user_id=user_id,
+                   created_at=created_at).save()
+
+    def get(self, session_id: str) -> Optional[dict]:
+        """ Returns a session, looked up through the `session_id` index,
+        None if there is none
+        """
+        user_session = self.model.query({"session_id": session_id}).first()
+        if user_session is None:
+            return None
+        return {"user_id": user_session.user_id,
+                "created_at": user_session.created_at}
+
+    def destroy(self, session_id: str) -> bool:
+        """ Removes the UserSession of a session ID
+        """
+        user_session = self.model.query({"session_id": session_id}).first()
+        if user_session is None:
+            return False
+        user_session.remove()
+        return True
+
+    def purge(self, before: datetime, limit: int = None) -> int:
+        """ Removes the oldest UserSessions created before a time, found
+        through the sorted `created_at` index, persisting them once
+        """
+        from models.query import Range
+        expired = self.model.query(
+            {"created_at": Range(lt=before)}).limit(limit).all()
+        with self.model.batch():
+            for user_session in expired:
+                user_session.remove()
+        return len(expired)
+
+    def __len__(self) -> int:
+        """ Returns the number of sessions """
+        return self.model.count()
+
+
+STORES = {}
+_STORES_LOCK = threading.Lock()
+
+
+def session_store(name: str = None, sessions: dict = None) -> SessionStore:
+    """ Returns the session store called `name`, created once per process
+
+    Args:
+        name(str): "memory", "sqlite" or "model", read from SESSION_STORE
+            if None
+        sessions(dict): Dict of the memory store, when it is created
+
+    Raises:
+        ValueError: If the store is unknown
+    """
+    if name is None:
+        name = getenv('SESSION_STORE', 'memory')
+    with _STORES_LOCK:
+        store = STORES.get(name)
+        if store is None:
+            if name == 'memory':
+                store = MemorySessionStore(sessions)
+            elif name == 'sqlite':
+                store = SQLiteSessionStore(
+                    getenv('SESSION_STORE_PATH', '.sessions.sqlite3'))
+            elif name == 'model':
+                store = ModelSessionStore()
+            else:
+                raise ValueError("Unknown session store: {}".format(name))
+            STORES[name] = store
+        return store
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """ Module of Index views
 """
-from flask import jsonify, abort
+from flask import jsonify, abort, current_app
 from api.v1.views import app_views
 
 
@@ -19,10 +19,17 @@ def stats() -> str:
     """ GET /api/v1/stats
     Return:
       - the number of each objects
+      - the Basic credential cache statistics, with Basic auth
+      - the counters of each strategy, with an auth chain
     """
     from models.user import User
+    auth = current_app.config.get("AUTH")
     stats = {}
     stats['users'] = User.count()
+    if hasattr(auth, 'credential_cache'):
+        stats['basic_auth_cache'] = auth.credential_cache.stats()
+    if hasattr(auth, 'strategies'):
+        stats['auth_chain'] = auth.stats()
     return jsonify(stats)
 
 
@@ -2,8 +2,8 @@
 """
 Handles all routes for session authentication
 """
-from api.v1.app import app_views
-from flask import abort, jsonify, make_response, request
+from api.v1.views import app_views
+from flask import abort, current_app, jsonify, make_response, request
 from models.user import User
 from os import getenv
 
@@ -22,18 +22,17 @@ def login():
         return jsonify({"error": "password missing"}), 400
 
     # Retrieve and validate user based on provided email and password
-    users = User.search({"email": email})
-    if not users:
+    # Assumed emails were unique and extracted first match
+    user = User.query({"email": email}).first()
+    if user is None:
         return jsonify({"error": "no user found for this email"}), 404
 
-    user = users[0]  # Assumed emails were unique and extracted first match
-
     # Validate user password
     if not user.is_valid_password(password):
         return jsonify({"error": "wrong password"}), 401
 
     # Create Session ID for user
-    from api.v1.app import auth
+    auth = current_app.config.get("AUTH")
     session_id = auth.create_session(user.id)
     response = make_response(jsonify(user.to_json()))
     session_name = getenv('SESSION_NAME')
@@ -46,7 +45,7 @@ def login():
                  strict_slashes=False)
 def logout():
     """ Logs out a user """
-    from api.v1.app import auth
+    auth = current_app.config.get("AUTH")
 
     destroy_session_result = auth.destroy_session(request)
     if not destroy_session_result:
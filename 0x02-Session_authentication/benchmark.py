@@ -0,0 +1,648 @@
+#!/usr/bin/env python3
+""" Benchmarks of the models storage
+
+Runs in a temporary directory, so the `.db_*.json` files of the project
+are left untouched.
+
+Usage:
+    ./benchmark.py save [sizes...]
+    ./benchmark.py search [sizes...]
+    ./benchmark.py load [sizes...]
+    ./benchmark.py format [sizes...]
+    ./benchmark.py bulk [sizes...]
+    ./benchmark.py query [sizes...]
+    ./benchmark.py stress [--readers N] [--writers N] [--seconds S]
+    ./benchmark.py shared [sizes...]
+    ./benchmark.py engines [sizes...]
+    ./benchmark.py basic [--requests N]
+    ./benchmark.py paths [rules...]
+    ./benchmark.py sessions [--logins N] [--rate R] [--duration S]
+    ./benchmark.py stores [--sessions N]
+"""
+import argparse
+import base64
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from typing import Callable, List
+
+import models.base
+from models.base import DATA
+from models.query import Range
+from models.store import Store
+from models.user import User
+
+
+def populate(n: int):
+    """ Fill DATA with `n` users and write them to file
+    """
+    DATA["User"] = Store()
+    for i in range(n):
+        user = User(email="user{}@hbtn.io".format(i), first_name="First",
+                    last_name="Last{}".format(i))
+        user.password = "password{}".format(i)
+        DATA["User"][user.id] = user
+    User.rebuild_indexes()
+    User.write_snapshot()
+
+
+def latency(func: Callable, runs: int) -> float:
+    """ Return the median latency of `func` in milliseconds
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def bench_save(sizes: List[int], runs: int):
+    """ Compare `save()` latency with full rewrites, with the journal and
+    with write-behind
+    """
+    print("{:>10} {:>16} {:>16} {:>16}".format(
+        "users", "file save ms", "journal save ms", "behind save ms"))
+    for n in sizes:
+        populate(n)
+        users = list(DATA["User"].values())
+        results = []
+        for persistence in ("file", "journal"):
+            models.base.PERSISTENCE = persistence
+            results.append(latency(lambda: users[0].save(), runs))
+            journal = User.journal()
+            if journal is not None:
+                journal.wait()
+                journal.reset()
+        models.base.PERSISTENCE = "file"
+        models.base.WRITE_BEHIND = True
+        results.append(latency(lambda: users[0].save(), runs))
+        User.flusher().flush()
+        models.base.WRITE_BEHIND = False
+        print("{:>10} {:>16.3f} {:>16.3f} {:>16.3f}".format(n, *results))
+
+
+def bench_search(sizes: List[int], runs: int):
+    """ Compare `search()` on the indexed `email` with a scan on `last_name`
+    """
+    print("{:>10} {:>16} {:>16}".format("users", "indexed ms", "scan ms"))
+    for n in sizes:
+        populate(n)
+        last = n - 1
+        indexed = latency(lambda: User.search(
+            {"email": "user{}@hbtn.io".format(last)}), runs)
+        scan = latency(lambda: User.search(
+            {"last_name": "Last{}".format(last)}), runs)
+        print("{:>10} {:>16.3f} {:>16.3f}".format(n, indexed, scan))
+
+
+LOAD_SCRIPT = """
+import resource, sys, time
+sys.path.insert(0, {root!r})
+from models.user import User
+start = time.perf_counter()
+User.load_from_file()
+elapsed = time.perf_counter() - start
+with open("/proc/self/statm") as f:
+    rss = int(f.read().split()[1]) * resource.getpagesize() // 1024
+print(elapsed, rss, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def write_users_file(n: int):
+    """ Write a `.db_User.json` of `n` users without building User objects
+    """
+    with open(".db_User.json", 'w') as f:
+        f.write("{")
+        for i in range(n):
+            obj_id = str(uuid.uuid4())
+            f.write("{}{}: {}".format(", " if i else "", json.dumps(obj_id),
+                                      json.dumps({
+                                          "id": obj_id,
+                                          "created_at": "2024-11-15T21:07:45",
+                                          "updated_at": "2024-11-15T21:07:45",
+                                          "email": "user{}@hbtn.io".format(i),
+                                          "_password": "{:064x}".format(i),
+                                          "first_name": "First",
+                                          "last_name": "Last{}".format(i)})))
+        f.write("}")
+
+
+def bench_load(sizes: List[int]):
+    """ Compare startup time and RSS of eager and lazy loading
+
+    Each load runs in a fresh process so that RSS is its own.
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+    print("{:>10} {:>6} {:>10} {:>12} {:>14}".format(
+        "users", "mode", "load s", "RSS KB", "peak RSS KB"))
+    for n in sizes:
+        write_users_file(n)
+        for mode, lazy in (("eager", "0"), ("lazy", "1")):
+            env = dict(os.environ, MODELS_LAZY_LOAD=lazy)
+            out = subprocess.run([sys.executable, "-c",
+                                  LOAD_SCRIPT.format(root=root)],
+                                 env=env, check=True, capture_output=True,
+                                 text=True).stdout.split()
+            print("{:>10} {:>6} {:>10.2f} {:>12} {:>14}".format(
+                n, mode, float(out[0]), out[1], out[2]))
+
+
+def bench_format(sizes: List[int], runs: int):
+    """ Compare file size, save time and load time of the snapshot formats
+    """
+    print("{:>10} {:>7} {:>12} {:>10} {:>10}".format(
+        "users", "format", "size KB", "save ms", "load ms"))
+    for n in sizes:
+        populate(n)
+        for name in ("json", "binary"):
+            models.base.FORMAT = name
+            save = latency(User.write_snapshot, runs)
+            size = os.path.getsize(User.snapshot_path()) // 1024
+            load = latency(User.load_from_file, runs)
+            print("{:>10} {:>7} {:>12} {:>10.1f} {:>10.1f}".format(
+                n, name, size, save, load))
+        models.base.FORMAT = "json"
+
+
+def bench_bulk(sizes: List[int]):
+    """ Compare creating users with a `save()` loop and with `save_many()`
+    """
+    print("{:>10} {:>14} {:>14}".format("users", "save loop s",
+                                        "save_many s"))
+    for n in sizes:
+        results = []
+        for bulk in (False, True):
+            populate(0)
+            users = [User(email="user{}@hbtn.io".format(i))
+                     for i in range(n)]
+            start = time.perf_counter()
+            if bulk:
+                User.save_many(users)
+            else:
+                for user in users:
+                    user.save()
+            results.append(time.perf_counter() - start)
+        print("{:>10} {:>14.3f} {:>14.3f}".format(n, *results))
+
+
+def bench_query(sizes: List[int], runs: int):
+    """ Compare `search()` followed by slicing with the query equivalents
+    """
+    print("{:>10} {:>24} {:>12} {:>12}".format("users", "lookup", "search ms",
+                                               "query ms"))
+    for n in sizes:
+        populate(n)
+        newest = max(user.created_at for user in DATA["User"].values())
+        cases = (
+            ("first match (scan)",
+             lambda: User.search({"first_name": "First"})[0],
+             lambda: User.query({"first_name": "First"}).first()),
+            ("10 newest",
+             lambda: sorted(User.all(), key=lambda user: user.created_at,
+                            reverse=True)[:10],
+             lambda: User.query().order_by("created_at",
+                                           reverse=True).limit(10).all()),
+            ("created in last second",
+             lambda: [user for user in User.all()
+                      if user.created_at >= newest],
+             lambda: User.query({"created_at": Range(ge=newest)}).all()),
+        )
+        for name, search, query in cases:
+            print("{:>10} {:>24} {:>12.3f} {:>12.3f}".format(
+                n, name, latency(search, runs), latency(query, runs)))
+
+
+def bench_stress(users: int, readers: int, writers: int,
+                 seconds: float) -> int:
+    """ Run reader and writer threads against the /api/v1/users endpoints
+
+    Readers list users and get one user; writers create, update and
+    delete users. Every response that is neither expected nor a 404 of a
+    user deleted meanwhile counts as an error.
+
+    Returns:
+        Number of errors
+    """
+    populate(users)
+    from api.v1.app import app
+    app.logger.disabled = True
+    User.load_from_file()
+
+    ids = list(DATA["User"].keys())
+    stop = threading.Event()
+    errors = []
+    read_times = []
+    counts = {"read": 0, "write": 0}
+    counts_lock = threading.Lock()
+
+    def record(kind: str, response, expected: tuple, elapsed: float = None):
+        with counts_lock:
+            counts[kind] += 1
+            if elapsed is not None:
+                read_times.append(elapsed)
+            if response.status_code not in expected:
+                errors.append("{} {}".format(response.status_code,
+                                             response.get_data(True)[:200]))
+
+    def reader(seed: int):
+        client = app.test_client()
+        i = seed
+        while not stop.is_set():
+            i += 1
+            try:
+                start = time.perf_counter()
+                response = client.get("/api/v1/users")
+                record("read", response, (200,),
+                       (time.perf_counter() - start) * 1000)
+                response = client.get(
+                    "/api/v1/users/{}".format(ids[i % len(ids)]))
+                record("read", response, (200, 404))
+            except Exception as e:
+                errors.append(repr(e))
+
+    def writer(seed: int):
+        client = app.test_client()
+        i = seed
+        while not stop.is_set():
+            i += 1
+            try:
+                response = client.post("/api/v1/users", json={
+                    "email": "w{}-{}@hbtn.io".format(seed, i),
+                    "password": "pwd"})
+                record("write", response, (201,))
+                user_id = response.get_json()["id"]
+                response = client.put(
+                    "/api/v1/users/{}".format(ids[i % len(ids)]),
+                    json={"first_name": "Updated{}".format(i)})
+                record("write", response, (200, 404))
+                response = client.delete("/api/v1/users/{}".format(user_id))
+                record("write", response, (200,))
+            except Exception as e:
+                errors.append(repr(e))
+
+    threads = [threading.Thread(target=reader, args=(n * 1000,))
+               for n in range(readers)]
+    threads += [threading.Thread(target=writer, args=(n * 1000,))
+                for n in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    flusher = User.flusher()
+    if flusher is not None:
+        flusher.flush()
+
+    print("{} users, {} readers, {} writers, {:.0f} s".format(
+        users, readers, writers, seconds))
+    print("reads: {}, writes: {}, errors: {}".format(
+        counts["read"], counts["write"], len(errors)))
+    if read_times:
+        read_times.sort()
+        print("list latency ms: p50 {:.2f}, p99 {:.2f}".format(
+            read_times[len(read_times) // 2],
+            read_times[int(len(read_times) * 0.99)]))
+    for error in errors[:5]:
+        print("  " + error)
+    return len(errors)
+
+
+SHARED_WRITER = """
+import sys
+sys.path.insert(0, {root!r})
+from models.user import User
+User.load_from_file()
+User(email="other@hbtn.io").save()
+"""
+
+
+def bench_shared(sizes: List[int], runs: int):
+    """ Measure what staying coherent with other processes costs a reader
+
+    For each size: a get() when no other process wrote, a get() right
+    after another process saved one user, and a full reload.
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, MODELS_SHARED="1")
+    models.base.SHARED = True
+    models.base.WRITE_LOCKS.clear()
+    models.base.JOURNALS.clear()
+    print("{:>10} {:>14} {:>14} {:>16}".format(
+        "users", "idle get us", "catch-up ms", "full reload ms"))
+    for n in sizes:
+        models.base.SYNC_STATES.clear()
+        User.journal().reset()
+        populate(n)
+        User.load_from_file()
+        user_id = next(iter(DATA["User"]))
+        idle = latency(lambda: User.get(user_id), runs * 100) * 1000
+        catch_up = []
+        for _ in range(runs):
+            subprocess.run([sys.executable, "-c",
+                            SHARED_WRITER.format(root=root)],
+                           env=env, check=True)
+            start = time.perf_counter()
+            User.get(user_id)
+            catch_up.append((time.perf_counter() - start) * 1000)
+        full = latency(User.load_from_file, runs)
+        print("{:>10} {:>14.2f} {:>14.3f} {:>16.1f}".format(
+            n, idle, statistics.median(catch_up), full))
+
+
+def bench_engines(sizes: List[int], runs: int):
+    """ Compare the memory and SQLite engines on the same users
+    """
+    print("{:>10} {:>7} {:>9} {:>9} {:>10} {:>9} {:>9} {:>9}".format(
+        "users", "engine", "load ms", "get ms", "email ms", "scan ms",
+        "first ms", "save ms"))
+    for n in sizes:
+        populate(n)
+        users = list(DATA["User"].values())
+        user = users[-1]
+        for engine in ("memory", "sqlite"):
+            models.base.ENGINE = engine
+            if engine == "sqlite":
+                # Imports the snapshot written by populate()
+                User.load_from_file()
+            load = latency(User.load_from_file, runs)
+            results = (
+                load,
+                latency(lambda: User.get(user.id), runs),
+                latency(lambda: User.search({"email": user.email}), runs),
+                latency(lambda: User.search({"last_name": user.last_name}),
+                        runs),
+                latency(lambda: User.query(
+                    {"first_name": "First"}).first(), runs),
+                latency(lambda: User.get(user.id).save(), runs))
+            print("{:>10} {:>7} {:>9.1f} {:>9.3f} {:>10.3f} {:>9.3f} "
+                  "{:>9.3f} {:>9.3f}".format(n, engine, *results))
+        models.base.ENGINE = "memory"
+        models.base.SQLITE_ENGINE.close()
+        models.base.SQLITE_ENGINE = None
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(models.base.SQLITE_PATH + suffix):
+                os.remove(models.base.SQLITE_PATH + suffix)
+
+
+def bench_basic(users: int, requests: int):
+    """ Compare Basic auth requests/sec of a repeat caller with and without
+    the credential cache
+    """
+    populate(users)
+    os.environ["AUTH_TYPE"] = "basic_auth"
+    import api.v1.app
+    from api.v1.auth.basic_auth import BasicAuth
+    User.load_from_file()
+
+    user = User.search({"email": "user{}@hbtn.io".format(users - 1)})[0]
+    user.password = "pwd"
+    user.save()
+    headers = {"Authorization": "Basic " + base64.b64encode(
+        "{}:pwd".format(user.email).encode()).decode()}
+    client = api.v1.app.app.test_client()
+
+    class Request():
+        """ Bare request, for timing current_user alone """
+        def __init__(self, headers: dict):
+            self.headers = headers
+
+    print("{:>8} {:>12} {:>18} {:>10} {:>12}".format(
+        "cache", "requests/s", "current_user us", "hit rate", "lookup us"))
+    for ttl in ("0", "60"):
+        os.environ["BASIC_AUTH_CACHE_TTL"] = ttl
+        api.v1.app.auth = BasicAuth()
+        request = Request(headers)
+        current_user = latency(lambda: api.v1.app.auth.current_user(request),
+                               requests) * 1000
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = client.get("/api/v1/users/me", headers=headers)
+            assert response.status_code == 200, response.status_code
+        elapsed = time.perf_counter() - start
+        stats = api.v1.app.auth.credential_cache.stats()
+        print("{:>8} {:>12.0f} {:>18.2f} {:>10.2f} {:>12.2f}".format(
+            "off" if ttl == "0" else "on", requests / elapsed, current_user,
+            stats["hit_rate"], stats["avg_lookup_us"]))
+
+
+def bench_paths(rules: List[int], runs: int):
+    """ Compare require_auth latency of the linear scan and of the compiled
+    PathMatcher, per number of exclusion rules
+    """
+    from api.v1.auth.auth import Auth
+    from api.v1.auth.path_matcher import PathMatcher
+
+    def linear(path: str, excluded_paths: List[str]) -> bool:
+        """ require_auth before the PathMatcher """
+        normalized_path = path.rstrip('/')
+        for excluded_path in excluded_paths:
+            if excluded_path.rstrip('/') == normalized_path:
+                return False
+        return True
+
+    auth = Auth()
+    print("{:>8} {:>12} {:>12} {:>12} {:>12}".format(
+        "rules", "linear us", "compiled us", "wildcard us", "miss us"))
+    for n in rules:
+        excluded_paths = ["/api/v1/public/{}/".format(i) for i in range(n)]
+        matcher = PathMatcher(excluded_paths + ["/api/v1/static/*"])
+        # Cycle over more paths than the result cache holds
+        paths = ["/api/v1/public/{}".format(i % n) for i in range(4096)]
+        wildcards = ["/api/v1/static/{}.css".format(i) for i in range(4096)]
+        misses = ["/api/v1/users/{}".format(i) for i in range(4096)]
+
+        def timed(func: Callable, paths: List[str]) -> float:
+            start = time.perf_counter()
+            for i in range(runs):
+                func(paths[i % len(paths)])
+            return (time.perf_counter() - start) / runs * 1000000
+
+        print("{:>8} {:>12.2f} {:>12.2f} {:>12.2f} {:>12.2f}".format(
+            n, timed(lambda path: linear(path, excluded_paths), paths),
+            timed(lambda path: auth.require_auth(path, matcher), paths),
+            timed(lambda path: auth.require_auth(path, matcher), wildcards),
+            timed(lambda path: auth.require_auth(path, matcher), misses)))
+
+
+def bench_sessions(logins: int, rate: int, duration: int) -> bool:
+    """ Simulate logins on a fake clock and check that the sessions of
+    SessionExpAuth stay bounded by the logins of one duration
+
+    Returns:
+        True if the sessions grew past the bound
+    """
+    from api.v1.auth.session_exp_auth import SessionExpAuth
+    from api.v1.auth.session_store import MemorySessionStore
+    from datetime import datetime, timedelta
+
+    os.environ["SESSION_DURATION"] = str(duration)
+    auth = SessionExpAuth()
+    auth.session_store = MemorySessionStore()
+    clock = [datetime(2024, 1, 1)]
+    auth.now = lambda: clock[0]
+    step = timedelta(seconds=1 / rate)
+    # Sessions of one duration, plus those a sweep batch may leave behind
+    bound = rate * (duration + 1) + auth.SWEEP_BATCH
+
+    tracemalloc.start()
+    print("{:>10} {:>10} {:>10} {:>10} {:>8} {:>10}".format(
+        "logins", "sessions", "heap", "MiB", "us", "expired"))
+    failed = False
+    report = max(1, logins // 10)
+    start = time.perf_counter()
+    first_id = None
+    for i in range(1, logins + 1):
+        clock[0] += step
+        session_id = auth.create_session("user{}".format(i % 1000))
+        if first_id is None:
+            first_id = session_id
+        if i % report == 0:
+            sessions = len(auth.session_store)
+            failed = failed or sessions > bound
+            print("{:>10} {:>10} {:>10} {:>10.1f} {:>8.2f} {:>10}".format(
+                i, sessions, len(auth.session_store._heap),
+                tracemalloc.get_traced_memory()[0] / 2 ** 20,
+                (time.perf_counter() - start) / report * 1000000,
+                auth.user_id_for_session_id(first_id) is None))
+            start = time.perf_counter()
+    tracemalloc.stop()
+    print("bound {} sessions: {}".format(bound, "FAIL" if failed else "ok"))
+    return failed
+
+
+def bench_stores(sessions: int):
+    """ Compare create, lookup, destroy and purge throughput of the session
+    stores
+    """
+    from api.v1.auth.session_store import (MemorySessionStore,
+                                           ModelSessionStore,
+                                           SQLiteSessionStore)
+    from datetime import datetime, timedelta
+
+    stores = [("memory", MemorySessionStore),
+              ("sqlite", lambda: SQLiteSessionStore("sessions.sqlite3")),
+              ("model", ModelSessionStore)]
+    created_at = datetime(2024, 1, 1)
+    ids = [str(uuid.uuid4()) for _ in range(sessions)]
+
+    def rate(func: Callable, items: list) -> float:
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        return len(items) / (time.perf_counter() - start)
+
+    print("{:>8} {:>12} {:>12} {:>12} {:>12}".format(
+        "store", "create/s", "lookup/s", "destroy/s", "purge/s"))
+    for name, factory in stores:
+        store = factory()
+        create = rate(lambda i: store.create(
+            ids[i], "user{}".format(i % 1000),
+            created_at + timedelta(seconds=i)), range(sessions))
+        lookup = rate(store.get, ids)
+        destroy = rate(store.destroy, ids[::2])
+        start = time.perf_counter()
+        purged = store.purge(created_at + timedelta(seconds=sessions))
+        purge = purged / (time.perf_counter() - start)
+        assert purged == sessions - len(ids[::2]), purged
+        print("{:>8} {:>12.0f} {:>12.0f} {:>12.0f} {:>12.0f}".format(
+            name, create, lookup, destroy, purge))
+
+
+def main():
+    """ Run the selected benchmark
+    """
+    parser = argparse.ArgumentParser(description="Benchmark models storage")
+    sub = parser.add_subparsers(dest="bench", required=True)
+    save = sub.add_parser("save", help="save() latency per store size")
+    save.add_argument("sizes", type=int, nargs="*",
+                      default=[1000, 100000, 1000000])
+    save.add_argument("--runs", type=int, default=5)
+    search = sub.add_parser("search", help="search() latency per store size")
+    search.add_argument("sizes", type=int, nargs="*",
+                        default=[1000, 100000, 1000000])
+    search.add_argument("--runs", type=int, default=5)
+    load = sub.add_parser("load", help="startup time and RSS of a load")
+    load.add_argument("sizes", type=int, nargs="*", default=[1000000])
+    fmt = sub.add_parser("format", help="snapshot size, save and load")
+    fmt.add_argument("sizes", type=int, nargs="*",
+                     default=[1000, 100000, 1000000])
+    fmt.add_argument("--runs", type=int, default=3)
+    bulk = sub.add_parser("bulk", help="save() loop against save_many()")
+    bulk.add_argument("sizes", type=int, nargs="*",
+                      default=[100, 1000, 2000])
+    query = sub.add_parser("query", help="search() against query()")
+    query.add_argument("sizes", type=int, nargs="*",
+                       default=[1000, 100000, 1000000])
+    query.add_argument("--runs", type=int, default=5)
+    stress = sub.add_parser("stress", help="threads on /api/v1/users")
+    stress.add_argument("--users", type=int, default=1000)
+    stress.add_argument("--readers", type=int, default=8)
+    stress.add_argument("--writers", type=int, default=4)
+    stress.add_argument("--seconds", type=float, default=10)
+    shared = sub.add_parser("shared", help="coherence cost, shared mode")
+    shared.add_argument("sizes", type=int, nargs="*",
+                        default=[1000, 100000])
+    shared.add_argument("--runs", type=int, default=5)
+    engines = sub.add_parser("engines", help="memory against SQLite")
+    engines.add_argument("sizes", type=int, nargs="*",
+                         default=[1000, 100000])
+    engines.add_argument("--runs", type=int, default=5)
+    basic = sub.add_parser("basic", help="Basic auth credential cache")
+    basic.add_argument("--users", type=int, default=10000)
+    basic.add_argument("--requests", type=int, default=2000)
+    paths = sub.add_parser("paths", help="require_auth per rule count")
+    paths.add_argument("rules", type=int, nargs="*",
+                       default=[4, 100, 1000, 10000])
+    paths.add_argument("--runs", type=int, default=20000)
+    sessions = sub.add_parser("sessions", help="SessionExpAuth growth")
+    sessions.add_argument("--logins", type=int, default=1000000)
+    sessions.add_argument("--rate", type=int, default=1000)
+    sessions.add_argument("--duration", type=int, default=60)
+    stores = sub.add_parser("stores", help="session store throughput")
+    stores.add_argument("--sessions", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        if args.bench == "save":
+            bench_save(args.sizes, args.runs)
+        elif args.bench == "search":
+            bench_search(args.sizes, args.runs)
+        elif args.bench == "load":
+            bench_load(args.sizes)
+        elif args.bench == "format":
+            bench_format(args.sizes, args.runs)
+        elif args.bench == "bulk":
+            bench_bulk(args.sizes)
+        elif args.bench == "query":
+            bench_query(args.sizes, args.runs)
+        elif args.bench == "engines":
+            bench_engines(args.sizes, args.runs)
+        elif args.bench == "basic":
+            bench_basic(args.users, args.requests)
+        elif args.bench == "paths":
+            bench_paths(args.rules, args.runs)
+        elif args.bench == "sessions":
+            if bench_sessions(args.logins, args.rate, args.duration):
+                sys.exit(1)
+        elif args.bench == "stores":
+            bench_stores(args.sessions)
+        elif args.bench == "shared":
+            bench_shared(args.sizes, args.runs)
+        elif args.bench == "stress":
+            if bench_stress(args.users, args.readers, args.writers,
+                            args.seconds):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,119 @@
 #!/usr/bin/env python3
 """ Base module
 """
-from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
-import json
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from models.batch import Batch
+from models.filelock import FileLock
+from models.flusher import WriteBehindFlusher
+from models.formats import EPOCH, detect, get_format
+from models.index import HashIndex, SortedIndex
+from models.journal import Journal, file_key
+from models.lazy import LazyObjects
+from models.query import Query
+from models.sqlite_engine import SQLiteEngine
+from models.store import Store
+from typing import Callable, TypeVar, List, Iterable, Iterator, Tuple
+from os import getenv, path
+import os
+import threading
 import uuid
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+TIMESTAMP_ATTRIBUTES = ("created_at", "updated_at")
 DATA = {}
 
+# "file" rewrites the whole file on every save/remove, "journal" appends
+# each mutation to a journal that is compacted in the background
+PERSISTENCE = getenv("MODELS_PERSISTENCE", "file")
+JOURNAL_MAX_BYTES = int(getenv("MODELS_JOURNAL_MAX_BYTES", 4 * 1024 * 1024))
+JOURNALS = {}
+INDEXES = {}
+
+# Keep objects serialized and only build the ones returned, caching up to
+# MODELS_LAZY_CACHE_SIZE of them
+LAZY_LOAD = getenv("MODELS_LAZY_LOAD", "0") == "1"
+LAZY_CACHE_SIZE = int(getenv("MODELS_LAZY_CACHE_SIZE", 10000))
+
+# Snapshot format: "json" (.db_<Class>.json) or "binary" (.db_<Class>.bin)
+FORMAT = getenv("MODELS_FORMAT", "json")
+
+# Write-behind: save/remove only mark the class dirty, and a background
+# thread rewrites it every MODELS_FLUSH_INTERVAL seconds or once
+# MODELS_FLUSH_MAX_DIRTY changes are pending
+WRITE_BEHIND = getenv("MODELS_WRITE_BEHIND", "0") == "1"
+FLUSH_INTERVAL = float(getenv("MODELS_FLUSH_INTERVAL", 1.0))
+FLUSH_MAX_DIRTY = int(getenv("MODELS_FLUSH_MAX_DIRTY", 1000))
+FLUSHER = None
+
+# "always" fsyncs every snapshot and journal write, "never" leaves it to
+# the OS
+FSYNC = getenv("MODELS_FSYNC", "never")
+
+# Batch open in the current thread, by class name
+BATCHES = threading.local()
+
+# Lock serializing the writers of each class, by class name
+WRITE_LOCKS = {}
+
+# Lock ordering the snapshot writes of each class, with the number of
+# snapshots taken and of the last one written, by class name
+SNAPSHOT_STATES = {}
+
+# Shared mode: several processes use the same files. Writes hold a lock
+# on .db_<Class>.lock and go to the journal; before reading, a process
+# compares the files with their state when it last synced, by class name,
+# and replays what other processes appended
+SHARED = getenv("MODELS_SHARED", "0") == "1"
+SYNC_STATES = {}
+
+# Storage engine: "memory" keeps the objects in DATA and persists them to
+# the .db_* files, "sqlite" keeps them in the MODELS_SQLITE_PATH database,
+# in which case the persistence, lazy loading, format, write-behind and
+# shared settings above do not apply
+ENGINE = getenv("MODELS_ENGINE", "memory")
+SQLITE_PATH = getenv("MODELS_SQLITE_PATH", ".db.sqlite3")
+SQLITE_ENGINE = None
+
+
+def to_datetime(value) -> datetime:
+    """ Return a serialized timestamp as a datetime
+
+    Timestamps are serialized as TIMESTAMP_FORMAT strings in JSON, as epoch
+    seconds or datetimes in binary snapshots.
+    """
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, (int, float)):
+        return EPOCH + timedelta(seconds=value)
+    return datetime.strptime(value, TIMESTAMP_FORMAT)
+
 
 class Base():
     """ Base class
+
+    Subclasses list the attributes `search` should look up through a hash
+    index in `INDEXED_ATTRIBUTES`, and the ones queries can order by or
+    match a range of through a sorted index in `SORTED_ATTRIBUTES`.
     """
+    INDEXED_ATTRIBUTES = ()
+    SORTED_ATTRIBUTES = ()
 
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
         s_class = str(self.__class__.__name__)
         if DATA.get(s_class) is None:
-            DATA[s_class] = {}
+            DATA.setdefault(s_class, Store())
 
         self.id = kwargs.get('id', str(uuid.uuid4()))
         if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
+            self.created_at = to_datetime(kwargs.get('created_at'))
         else:
             self.created_at = datetime.utcnow()
         if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
+            self.updated_at = to_datetime(kwargs.get('updated_at'))
         else:
             self.updated_at = datetime.utcnow()
 
@@ -58,54 +140,623 @@ class Base():
         return result
 
     @classmethod
-    def load_from_file(cls):
-        """ Load all objects from file
+    def indexes(cls) -> dict:
+        """ Indexes of the class, by attribute
+        """
+        s_class = cls.__name__
+        if INDEXES.get(s_class) is None:
+            indexes = {attribute: HashIndex(attribute)
+                       for attribute in cls.INDEXED_ATTRIBUTES}
+            indexes.update({attribute: SortedIndex(attribute)
+                            for attribute in cls.SORTED_ATTRIBUTES})
+            INDEXES[s_class] = indexes
+        return INDEXES[s_class]
+
+    @classmethod
+    def rebuild_indexes(cls):
+        """ Rebuild the indexes from the objects in DATA
+        """
+        with cls.write_lock():
+            cls._rebuild_indexes()
+
+    @classmethod
+    def _rebuild_indexes(cls):
+        """ Rebuild the indexes, with the write lock held
+
+        With lazy loading, sorted indexes are only invalidated: parsing
+        every timestamp would undo what lazy loading saves, so they are
+        built by `build_index` once a query needs them.
+        """
+        lazy = isinstance(cls.objects(), LazyObjects)
+        for attribute, index in cls.indexes().items():
+            if lazy and isinstance(index, SortedIndex):
+                index.invalidate()
+            else:
+                index.clear()
+                cls._fill_index(attribute, index)
+
+    @classmethod
+    def build_index(cls, attribute: str):
+        """ Build the index of `attribute` if it was invalidated
+        """
+        index = cls.indexes()[attribute]
+        if index.built:
+            return
+        with cls.write_lock():
+            if not index.built:
+                cls._fill_index(attribute, index)
+
+    @classmethod
+    def _fill_index(cls, attribute: str, index):
+        """ Add every object to an empty index, with the write lock held
+        """
+        objs = cls.snapshot()
+        if isinstance(objs, LazyObjects):
+            values = objs.attribute_values(attribute)
+            if attribute in TIMESTAMP_ATTRIBUTES:
+                values = ((obj_id, value if value is None
+                           else to_datetime(value))
+                          for obj_id, value in values)
+        else:
+            values = ((obj_id, getattr(obj, attribute, None))
+                      for obj_id, obj in objs.items())
+        index.add_many(values)
+
+    def _index(self):
+        """ Add the object to the indexes of its class
+        """
+        for attribute, index in self.__class__.indexes().items():
+            index.add(self.id, getattr(self, attribute, None))
+
+    def _unindex(self):
+        """ Remove the object from the indexes of its class
         """
+        for index in self.__class__.indexes().values():
+            index.discard(self.id)
+
+    @classmethod
+    def journal(cls) -> Journal:
+        """ Journal of the class, None unless persistence is "journal" or
+        the files are shared
+        """
+        if PERSISTENCE != "journal" and not SHARED:
+            return None
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
+        if JOURNALS.get(s_class) is None:
+            JOURNALS[s_class] = Journal(".db_{}.journal".format(s_class),
+                                        JOURNAL_MAX_BYTES,
+                                        fsync=(FSYNC == "always"),
+                                        lock=cls.write_lock(),
+                                        keep_open=not SHARED)
+        return JOURNALS[s_class]
+
+    @classmethod
+    def flusher(cls) -> WriteBehindFlusher:
+        """ Write-behind flusher, None unless write-behind is enabled
+        """
+        global FLUSHER
+
+        if not WRITE_BEHIND:
+            return None
+        if FLUSHER is None:
+            FLUSHER = WriteBehindFlusher(FLUSH_INTERVAL, FLUSH_MAX_DIRTY)
+        return FLUSHER
+
+    @classmethod
+    def snapshot_path(cls, fmt=None) -> str:
+        """ Path of the snapshot file of the class in `fmt`
+        """
+        fmt = fmt or get_format(FORMAT, TIMESTAMP_FORMAT)
+        return ".db_{}.{}".format(cls.__name__, fmt.extension)
+
+    @classmethod
+    def load_from_file(cls):
+        """ Load all objects from file, then replay the journal
+
+        The format of the file is detected from its header. A snapshot
+        found only in another format is loaded, rewritten in the configured
+        format, and renamed with a `.migrated` suffix. With write-behind,
+        changes of the class not flushed yet are written first, so the
+        reload keeps them.
+        """
+        engine = cls.engine()
+        if engine is not None:
+            cls._load_engine(engine)
+            return
+        SYNC_STATES.pop(cls.__name__, None)
+        with cls.write_lock():
+            flusher = cls.flusher()
+            if flusher is not None:
+                flusher.flush_class(cls)
+            cls._load()
+
+    @classmethod
+    def engine(cls) -> SQLiteEngine:
+        """ SQLite engine, None unless the engine is "sqlite"
+        """
+        global SQLITE_ENGINE
+
+        if ENGINE != "sqlite":
+            return None
+        if SQLITE_ENGINE is None:
+            SQLITE_ENGINE = SQLiteEngine(
+                SQLITE_PATH, TIMESTAMP_FORMAT,
+                synchronous="FULL" if FSYNC == "always" else "NORMAL")
+        return SQLITE_ENGINE
+
+    @classmethod
+    def _load_engine(cls, engine: SQLiteEngine):
+        """ Create the table of the class
+
+        If it is empty, the objects `_load` would load, from the snapshot
+        file and the journal replayed on top of it, are imported into it
+        in one transaction. Once it is committed, the files are renamed
+        with a `.migrated` suffix.
+        """
+        DATA.setdefault(cls.__name__, Store())
+        engine.table(cls)
+        if engine.count(cls) > 0:
+            return
+        file_path = cls._find_snapshot()
+        journal = Journal(".db_{}.journal".format(cls.__name__),
+                          JOURNAL_MAX_BYTES)
+        records = {}
+        cls._replay(file_path, journal, records.__setitem__,
+                    lambda obj_id: records.pop(obj_id, None))
+        if records:
+            engine.save_records(cls, records.values())
+        for retired_path in (file_path, journal.old_file_path,
+                             journal.file_path):
+            if path.exists(retired_path):
+                os.replace(retired_path, retired_path + ".migrated")
+
+    @classmethod
+    def _find_snapshot(cls) -> str:
+        """ Path of the snapshot file in the configured format, or in
+        another format if only that one exists
+        """
+        file_path = cls.snapshot_path()
         if not path.exists(file_path):
+            for name in ("json", "binary"):
+                other_path = cls.snapshot_path(
+                    get_format(name, TIMESTAMP_FORMAT))
+                if path.exists(other_path):
+                    return other_path
+        return file_path
+
+    @classmethod
+    def _replay(cls, file_path: str, journal: Journal, load: Callable,
+                remove: Callable, lazy: LazyObjects = None):
+        """ Pass the objects of a snapshot, then the mutations of a journal,
+        to `load(obj_id, obj_json)` and `remove(obj_id)`
+
+        Args:
+            file_path: Snapshot file, skipped if missing
+            journal: Journal replayed on top of the snapshot, if any
+            lazy: LazyObjects to build compact records for, if any
+        """
+        if path.exists(file_path):
+            with open(file_path, 'rb') as f:
+                fmt = detect(f, TIMESTAMP_FORMAT)
+                objs_json = fmt.load(f, lazy)
+                for obj_id, obj_json in objs_json.items():
+                    load(obj_id, obj_json)
+
+        if journal is not None:
+            for op, record in journal.replay():
+                if op == "save":
+                    obj_json = record["obj"]
+                    load(obj_json["id"], obj_json)
+                elif op == "remove":
+                    remove(record["id"])
+
+    @classmethod
+    def _load(cls):
+        """ Load all objects, with the write lock held
+        """
+        s_class = cls.__name__
+        file_path = cls._find_snapshot()
+        migrate_from = None
+        if file_path != cls.snapshot_path():
+            migrate_from = file_path
+
+        if LAZY_LOAD:
+            objs = LazyObjects(cls, LAZY_CACHE_SIZE, TIMESTAMP_FORMAT)
+            load = objs.load_raw
+        else:
+            objs = {}
+
+            def load(obj_id, obj_json):
+                objs[obj_id] = cls(**obj_json)
+        DATA[s_class] = objs if LAZY_LOAD else Store(objs)
+
+        cls._replay(file_path, cls.journal(), load,
+                    lambda obj_id: objs.pop(obj_id, None),
+                    objs if LAZY_LOAD else None)
+
+        cls.rebuild_indexes()
+
+        if migrate_from is not None:
+            cls.save_to_file()
+            os.replace(migrate_from, migrate_from + ".migrated")
+
+        if SHARED:
+            SYNC_STATES[s_class] = cls._file_state()
+
+    @classmethod
+    def _file_state(cls) -> tuple:
+        """ Return the keys of the snapshot and of the journal
+        """
+        return (file_key(cls.snapshot_path()),
+                file_key(".db_{}.journal".format(cls.__name__)))
+
+    @classmethod
+    def refresh(cls):
+        """ Catch up with the changes other processes made, in shared mode
+
+        When the files are as they were at the last sync, this costs two
+        stat calls.
+        """
+        if not SHARED:
+            return
+        synced = SYNC_STATES.get(cls.__name__)
+        if synced is not None and synced != cls._file_state():
+            with cls.write_lock():
+                pass
+
+    @classmethod
+    def _catch_up(cls):
+        """ Apply what other processes wrote since the last sync
+
+        Called once the write lock is held. Records appended to the same
+        journal are replayed from where the last sync stopped; a new
+        snapshot or journal, left by a compaction, is loaded in full.
+        """
+        synced = SYNC_STATES.get(cls.__name__)
+        if synced is None:
+            return
+        state = cls._file_state()
+        if state == synced:
+            return
+        snapshot, journal = state
+        synced_snapshot, synced_journal = synced
+        offset = 0
+        if synced_journal is not None:
+            offset = synced_journal[2]
+        if snapshot != synced_snapshot or journal is None or \
+                (synced_journal is not None and
+                 journal[0] != synced_journal[0]) or journal[2] < offset:
+            cls._load()
+            return
+        records, _ = cls.journal().read_from(offset)
+        for op, record in records:
+            cls._apply(op, record)
+
+    @classmethod
+    def _mark_synced(cls):
+        """ Record the files as synced, before the write lock is released
+
+        Whatever changed them while the lock was held is in DATA.
+        """
+        if cls.__name__ in SYNC_STATES:
+            SYNC_STATES[cls.__name__] = cls._file_state()
+
+    @classmethod
+    def _apply(cls, op: str, record: dict):
+        """ Apply a journal record to DATA and the indexes
+        """
+        objs = DATA[cls.__name__]
+        indexes = cls.indexes()
+        if op == "remove":
+            objs.pop(record["id"], None)
+            for index in indexes.values():
+                index.discard(record["id"])
+            return
+        obj_json = record["obj"]
+        if not isinstance(objs, LazyObjects):
+            obj = cls(**obj_json)
+            objs[obj.id] = obj
+            obj._index()
             return
+        objs.load_raw(obj_json["id"], obj_json)
+        for attribute, index in indexes.items():
+            value = obj_json.get(attribute)
+            if attribute in TIMESTAMP_ATTRIBUTES and value is not None:
+                value = to_datetime(value)
+            index.add(obj_json["id"], value)
 
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+    @classmethod
+    def write_snapshot(cls):
+        """ Write all objects to file, atomically replacing it
+
+        Only the copy-on-write snapshot of the objects is taken with the
+        write lock held, and numbered. They are serialized under the
+        snapshot lock of the class, so writers do not wait for the dump,
+        and a snapshot older than the last one written is dropped, so it
+        never replaces a newer one. In shared mode, other processes write
+        the snapshot too, so the whole write holds the write lock.
+        """
+        state = SNAPSHOT_STATES.get(cls.__name__)
+        if state is None:
+            state = SNAPSHOT_STATES.setdefault(
+                cls.__name__, {"lock": threading.Lock(), "taken": 0,
+                               "written": 0})
+        write_lock = cls.write_lock()
+        with write_lock:
+            objs = cls.snapshot()
+            raw = isinstance(objs, LazyObjects)
+            if raw:
+                objs = objs.raw_records()
+            state["taken"] += 1
+            number = state["taken"]
+            if SHARED:
+                cls._write_snapshot(objs, raw)
+                return
+
+        with state["lock"]:
+            if number < state["written"]:
+                return
+            cls._write_snapshot(objs, raw)
+            state["written"] = number
+
+    @classmethod
+    def _write_snapshot(cls, objs: dict, raw: bool = False):
+        """ Serialize `objs` to the snapshot file, atomically replacing it
+
+        Args:
+            objs: Objects by ID
+            raw: If True, `objs` holds the RawRecords of LazyObjects
+        """
+        fmt = get_format(FORMAT, TIMESTAMP_FORMAT)
+        file_path = cls.snapshot_path(fmt)
+        if raw:
+            records = (dict(zip(*raw)) for raw in objs.values())
+        else:
+            records = (dict(obj.__dict__) for obj in objs.values())
+
+        tmp_path = "{}.{}.tmp".format(file_path, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            fmt.dump(f, records)
+            if FSYNC == "always":
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
 
     @classmethod
     def save_to_file(cls):
         """ Save all objects to file
         """
+        if cls.engine() is not None:
+            return
+        journal = cls.journal()
+        if journal is None:
+            cls.write_snapshot()
+        else:
+            journal.compact(cls.write_snapshot)
+
+    @classmethod
+    def current_batch(cls) -> Batch:
+        """ Batch open on the class in the current thread, if any
+        """
+        return getattr(BATCHES, cls.__name__, None)
+
+    @classmethod
+    @contextmanager
+    def batch(cls) -> Iterator[Batch]:
+        """ Group the mutations of the class made in a `with` block
+
+        save() and remove() update DATA and the indexes as usual, but
+        nothing is persisted until the block exits, then all changes are
+        persisted at once. If the block raises, DATA and the indexes are
+        restored to the objects they held before it, and the stored
+        objects to their attributes before it: while the block runs, the
+        class copies the attributes of a stored object into the batch
+        before they are first set. A batch opened inside another one
+        joins it. The write lock of the class is held for the whole block.
+
+        With the SQLite engine, the block runs in a transaction and yields
+        None.
+        """
+        engine = cls.engine()
+        if engine is not None:
+            with engine.transaction():
+                yield None
+            return
+
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
+        batch = cls.current_batch()
+        if batch is not None:
+            yield batch
+            return
+
+        with cls.write_lock():
+            batch = Batch()
+            setattr(BATCHES, s_class, batch)
+            cls.__setattr__ = Base._batch_setattr
+            try:
+                yield batch
+            except BaseException:
+                setattr(BATCHES, s_class, None)
+                cls.rollback(batch)
+                raise
+            finally:
+                del cls.__setattr__
+            setattr(BATCHES, s_class, None)
+            if batch.changes:
+                cls.persist_many(list(batch.changes.values()))
+
+    def _batch_setattr(self, name: str, value):
+        """ Set an attribute, first copying the attributes of the object
+        into the batch open on its class in the current thread, if it is
+        the object stored under its ID
+
+        Installed as `__setattr__` of the class while a batch is open.
+        Objects being built, such as new or hydrated ones, are not stored
+        yet, so they are not copied.
+        """
+        s_class = self.__class__.__name__
+        batch = getattr(BATCHES, s_class, None)
+        if batch is not None:
+            objs = DATA.get(s_class)
+            obj_id = self.__dict__.get("id")
+            if isinstance(objs, LazyObjects):
+                stored = objs.cached(obj_id)
+            else:
+                stored = objs.get(obj_id) if objs is not None else None
+            if stored is self:
+                batch.remember(self)
+        object.__setattr__(self, name, value)
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+    @classmethod
+    def rollback(cls, batch: Batch):
+        """ Restore the objects a batch changed
+
+        Stored objects get back the attributes copied before the batch
+        first changed them, then DATA and the indexes get back the
+        objects they held. Objects created in the batch are left as is.
+        """
+        objs = DATA[cls.__name__]
+        indexes = cls.indexes().values()
+        for obj, state in batch.states.values():
+            obj.__dict__.clear()
+            obj.__dict__.update(state)
+        for obj_id, previous in batch.previous.items():
+            if previous is None:
+                objs.pop(obj_id, None)
+                for index in indexes:
+                    index.discard(obj_id)
+            else:
+                objs[obj_id] = previous
+                previous._index()
+
+    @classmethod
+    def save_many(cls, objs: Iterable[TypeVar('Base')]):
+        """ Save objects, persisting them once
+        """
+        with cls.batch():
+            for obj in objs:
+                obj.save()
 
     def save(self):
         """ Save current object
         """
         s_class = self.__class__.__name__
-        self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        engine = self.__class__.engine()
+        if engine is not None:
+            self.updated_at = datetime.utcnow()
+            engine.save(self)
+            return
+        with self.__class__.write_lock():
+            batch = self.__class__.current_batch()
+            if batch is not None:
+                batch.touch(self.id, DATA[s_class].get(self.id))
+            self.updated_at = datetime.utcnow()
+            DATA[s_class][self.id] = self
+            self._index()
+            self.__class__.persist("save", self)
 
     def remove(self):
         """ Remove object
         """
         s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
+        engine = self.__class__.engine()
+        if engine is not None:
+            engine.remove(self)
+            return
+        with self.__class__.write_lock():
+            previous = DATA[s_class].get(self.id)
+            if previous is None:
+                return
+            batch = self.__class__.current_batch()
+            if batch is not None:
+                batch.touch(self.id, previous)
             del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+            self._unindex()
+            self.__class__.persist("remove", self)
+
+    @classmethod
+    def persist(cls, op: str, obj: TypeVar('Base')):
+        """ Persist a "save" or "remove" of `obj`, or add it to the open
+        batch
+        """
+        batch = cls.current_batch()
+        if batch is not None:
+            batch.add(op, obj)
+        else:
+            cls.persist_many([(op, obj)])
+
+    @classmethod
+    def persist_many(cls, changes: List[Tuple[str, TypeVar('Base')]]):
+        """ Persist a list of ("save" or "remove", object)
+
+        The changes are appended to the journal in journal mode, left to
+        the flusher in write-behind mode, and otherwise written by
+        rewriting the whole file once.
+        """
+        journal = cls.journal()
+        flusher = cls.flusher()
+        if journal is not None:
+            journal.append_many([
+                journal.save_record(obj.to_json(True)) if op == "save"
+                else journal.remove_record(obj.id)
+                for op, obj in changes], cls.write_snapshot)
+        elif flusher is not None:
+            flusher.mark_dirty(cls)
+        else:
+            cls.save_to_file()
+
+    @classmethod
+    def write_lock(cls) -> threading.RLock:
+        """ Lock serializing the writers of the class
+
+        save(), remove(), batches, snapshots and index rebuilds hold it;
+        readers never take it. In shared mode it is a FileLock, which also
+        serializes the other processes and catches up with their changes
+        when acquired.
+        """
+        lock = WRITE_LOCKS.get(cls.__name__)
+        if lock is None:
+            if SHARED:
+                lock = FileLock(".db_{}.lock".format(cls.__name__),
+                                on_acquire=cls._catch_up,
+                                on_release=cls._mark_synced)
+            else:
+                lock = threading.RLock()
+            lock = WRITE_LOCKS.setdefault(cls.__name__, lock)
+        return lock
+
+    @classmethod
+    def snapshot(cls) -> dict:
+        """ Objects of the class, by ID, as a view no writer changes
+        """
+        return DATA[cls.__name__].snapshot()
+
+    @classmethod
+    def objects(cls) -> dict:
+        """ Objects of the class, by ID, as writers change them
+
+        Only `get` is safe to call while the class is written; iterate a
+        `snapshot()` instead.
+        """
+        return DATA[cls.__name__]
+
+    @classmethod
+    def query(cls, attributes: dict = {}) -> Query:
+        """ Return a Query of the objects with matching attributes
+
+        Values are matched by equality, or can be a Range or a Prefix.
+        """
+        return Query(cls, attributes)
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
         s_class = cls.__name__
+        engine = cls.engine()
+        if engine is not None:
+            return engine.count(cls)
+        cls.refresh()
         return len(DATA[s_class].keys())
 
     @classmethod
@@ -119,20 +770,17 @@ class Base():
         """ Return one object by ID
         """
         s_class = cls.__name__
+        engine = cls.engine()
+        if engine is not None:
+            return engine.get(cls, id)
+        cls.refresh()
         return DATA[s_class].get(id)
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
-        """
-        s_class = cls.__name__
 
-        def _search(obj):
-            if len(attributes) == 0:
-                return True
-            for k, v in attributes.items():
-                if (getattr(obj, k) != v):
-                    return False
-            return True
-
-        return list(filter(_search, DATA[s_class].values()))
+        If an attribute of the filter is indexed, only the objects found
+        in its index are checked, otherwise all objects are scanned.
+        """
+        return cls.query(attributes).all()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+""" Batch module
+
+Mutations of one model class grouped to be persisted together.
+"""
+from typing import Any
+
+
+class Batch():
+    """ Mutations of one model class made inside `Base.batch()`
+
+    `changes` holds the last operation on each touched object, which is
+    all that needs persisting. `previous` holds the object each ID mapped
+    to before its first change, None for new objects, and `states` a copy
+    of the attributes of each object before the block first changed it,
+    by object identity, so the batch can be rolled back.
+    """
+
+    def __init__(self):
+        """ Initialize a Batch
+        """
+        self.changes = {}
+        self.previous = {}
+        self.states = {}
+
+    def touch(self, obj_id: str, previous: Any):
+        """ Remember what `obj_id` mapped to before the batch changed it
+        """
+        if obj_id not in self.previous:
+            self.previous[obj_id] = previous
+            if previous is not None:
+                self.remember(previous)
+
+    def remember(self, obj: Any):
+        """ Copy the attributes of `obj`, unless they were copied already
+        """
+        if id(obj) not in self.states:
+            self.states[id(obj)] = (obj, dict(obj.__dict__))
+
+    def add(self, op: str, obj: Any):
+        """ Record a "save" or "remove" of `obj`
+        """
+        self.changes[obj.id] = (op, obj)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+""" File lock module
+
+Lock shared by the threads and processes writing the same files.
+"""
+from typing import Callable
+import fcntl
+import threading
+
+
+class FileLock():
+    """ Reentrant lock held by one thread of one process at a time
+
+    Threads of a process are serialized by an RLock, processes by an
+    exclusive `flock` on `file_path`. The outermost acquisition calls
+    `on_acquire` once both are held, and the outermost release calls
+    `on_release` before letting go of them.
+    """
+
+    def __init__(self, file_path: str, on_acquire: Callable = None,
+                 on_release: Callable = None):
+        """ Initialize a FileLock
+        """
+        self.file_path = file_path
+        self.on_acquire = on_acquire
+        self.on_release = on_release
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def acquire(self):
+        """ Acquire the lock, blocking until it is free
+        """
+        self._lock.acquire()
+        self._depth += 1
+        if self._depth > 1:
+            return
+        try:
+            self._file = open(self.file_path, 'a')
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            if self.on_acquire is not None:
+                self.on_acquire()
+        except BaseException:
+            self._unlock()
+            raise
+
+    def release(self):
+        """ Release the lock
+        """
+        if self._depth > 1:
+            self._depth -= 1
+            self._lock.release()
+            return
+        try:
+            if self.on_release is not None:
+                self.on_release()
+        finally:
+            self._unlock()
+
+    def _unlock(self):
+        """ Drop the outermost hold of the file and of the RLock
+        """
+        if self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._depth -= 1
+        self._lock.release()
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
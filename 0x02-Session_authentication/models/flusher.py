@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+""" Flusher module
+
+Write-behind persistence of model classes.
+"""
+import atexit
+import threading
+import traceback
+
+
+class WriteBehindFlusher():
+    """ Persists dirty model classes from a background thread
+
+    `mark_dirty` only records that a class changed. The thread writes each
+    dirty class once `interval` seconds have passed since the last flush,
+    or as soon as `max_dirty` changes are pending, so a burst of saves
+    costs one write. Pending changes are flushed when the process exits.
+    """
+
+    def __init__(self, interval: float, max_dirty: int):
+        """ Initialize a WriteBehindFlusher
+        """
+        self.interval = interval
+        self.max_dirty = max_dirty
+        self._dirty = {}
+        self._pending = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def mark_dirty(self, cls: type):
+        """ Record a change of `cls`, to be written by the next flush
+        """
+        with self._condition:
+            self._dirty[cls.__name__] = cls
+            self._pending += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+            if self._pending >= self.max_dirty:
+                self._condition.notify()
+
+    def flush(self):
+        """ Write every dirty class now
+        """
+        with self._condition:
+            dirty = list(self._dirty.values())
+            self._dirty = {}
+            self._pending = 0
+        for cls in dirty:
+            try:
+                cls.write_snapshot()
+            except Exception:
+                traceback.print_exc()
+                with self._condition:
+                    self._dirty.setdefault(cls.__name__, cls)
+
+    def flush_class(self, cls: type):
+        """ Write `cls` now if it has pending changes
+        """
+        with self._condition:
+            if self._dirty.pop(cls.__name__, None) is None:
+                return
+        try:
+            cls.write_snapshot()
+        except Exception:
+            with self._condition:
+                self._dirty.setdefault(cls.__name__, cls)
+            raise
+
+    def _run(self):
+        """ Flush every `interval` seconds, or early once `max_dirty`
+        changes are pending
+        """
+        while True:
+            with self._condition:
+                if self._stopped:
+                    return
+                self._condition.wait_for(
+                    lambda: self._stopped or self._pending >= self.max_dirty,
+                    timeout=self.interval)
+            self.flush()
+
+    def stop(self):
+        """ Stop the thread and flush pending changes
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
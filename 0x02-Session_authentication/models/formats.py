@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+""" Formats module
+
+On-disk formats of the model snapshots.
+"""
+from datetime import datetime, timedelta
+from typing import BinaryIO, Iterable
+import json
+import zlib
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class JsonFormat():
+    """ `{id: {attribute: value}}` JSON, timestamps as strings
+    """
+    name = "json"
+    extension = "json"
+
+    def __init__(self, timestamp_format: str):
+        """ Initialize a JsonFormat
+        """
+        self.timestamp_format = timestamp_format
+
+    def dump(self, f: BinaryIO, records: Iterable[dict]):
+        """ Write the serialized objects to `f`
+        """
+        objs_json = {}
+        for record in records:
+            objs_json[record["id"]] = {
+                key: (value.strftime(self.timestamp_format)
+                      if type(value) is datetime else value)
+                for key, value in record.items()}
+        f.write(json.dumps(objs_json).encode('utf-8'))
+
+    def load(self, f: BinaryIO, lazy=None) -> dict:
+        """ Read the serialized objects from `f`, by ID
+
+        Args:
+            f: File positioned at the start of the data
+            lazy: LazyObjects to build compact records for, if any
+        """
+        hook = lazy.json_hook if lazy is not None else None
+        return json.loads(f.read(), object_pairs_hook=hook)
+
+
+class BinaryFormat():
+    """ zlib-compressed JSON rows, timestamps as epoch seconds
+
+    Objects are grouped by attribute layout; each group is stored as its
+    keys, the positions of its timestamps and its rows of values, so keys
+    are written once per layout rather than once per object. JSON keeps
+    the file readable by any Python version and only builds plain values,
+    whatever the file contains.
+    """
+    name = "binary"
+    extension = "bin"
+    MAGIC = b"HBTNDB\x01"
+
+    def __init__(self, timestamp_format: str, level: int = 6):
+        """ Initialize a BinaryFormat
+        """
+        self.timestamp_format = timestamp_format
+        self.level = level
+
+    def dump(self, f: BinaryIO, records: Iterable[dict]):
+        """ Write the serialized objects to `f`
+        """
+        groups = {}
+        for record in records:
+            keys = tuple(record.keys())
+            group = groups.get(keys)
+            if group is None:
+                group = groups[keys] = (set(), [])
+            timestamps, rows = group
+            row = list(record.values())
+            for i, value in enumerate(row):
+                if type(value) is datetime:
+                    row[i] = int((value - EPOCH).total_seconds())
+                    timestamps.add(i)
+            rows.append(tuple(row))
+
+        payload = [(keys, sorted(timestamps), rows)
+                   for keys, (timestamps, rows) in groups.items()]
+        f.write(self.MAGIC)
+        f.write(zlib.compress(json.dumps(
+            payload, separators=(',', ':')).encode('utf-8'), self.level))
+
+    def load(self, f: BinaryIO, lazy=None) -> dict:
+        """ Read the serialized objects from `f`, by ID
+
+        Args:
+            f: File positioned after the header
+            lazy: LazyObjects to build compact records for, if any
+        """
+        objs = {}
+        for keys, timestamps, rows in json.loads(zlib.decompress(
+                f.read())):
+            keys = tuple(keys)
+            id_index = keys.index("id")
+            for row in rows:
+                if timestamps:
+                    for i in timestamps:
+                        if type(row[i]) is int:
+                            row[i] = EPOCH + timedelta(seconds=row[i])
+                if lazy is not None:
+                    objs[row[id_index]] = lazy.record(keys, tuple(row))
+                else:
+                    objs[row[id_index]] = dict(zip(keys, row))
+        return objs
+
+
+def get_format(name: str, timestamp_format: str):
+    """ Return the format called `name`
+    """
+    for fmt in (JsonFormat, BinaryFormat):
+        if fmt.name == name:
+            return fmt(timestamp_format)
+    raise ValueError("Unknown storage format: {}".format(name))
+
+
+def detect(f: BinaryIO, timestamp_format: str):
+    """ Return the format of an open file, from its header
+
+    The file is left positioned at the start of the data.
+    """
+    header = f.read(len(BinaryFormat.MAGIC))
+    if header == BinaryFormat.MAGIC:
+        return BinaryFormat(timestamp_format)
+    f.seek(0)
+    return JsonFormat(timestamp_format)
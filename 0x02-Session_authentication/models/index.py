@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+""" Index module
+
+Secondary indexes over model attributes.
+"""
+from bisect import bisect_left, bisect_right
+from typing import Any, Iterable, Iterator, Set, Tuple
+
+
+class HashIndex():
+    """ Maps the values of one attribute to the IDs of the objects having it
+
+    The value last indexed for each ID is remembered, so an object whose
+    attribute changed between two saves is moved to its new value. A value
+    held by a single object maps to its ID directly rather than to a set,
+    which keeps unique attributes such as emails compact.
+    """
+    built = True
+
+    def __init__(self, attribute: str):
+        """ Initialize a HashIndex
+        """
+        self.attribute = attribute
+        self._ids_by_value = {}
+        self._value_by_id = {}
+
+    def add(self, obj_id: str, value: Any):
+        """ Index `obj_id` under `value`
+        """
+        if obj_id in self._value_by_id:
+            if self._value_by_id[obj_id] == value:
+                return
+            self.discard(obj_id)
+        try:
+            ids = self._ids_by_value.get(value)
+        except TypeError:  # Unhashable values are left to scans
+            return
+        if ids is None:
+            self._ids_by_value[value] = obj_id
+        elif type(ids) is set:
+            ids.add(obj_id)
+        else:
+            self._ids_by_value[value] = {ids, obj_id}
+        self._value_by_id[obj_id] = value
+
+    def add_many(self, pairs: Iterable[Tuple[str, Any]]):
+        """ Index (ID, value) pairs
+        """
+        for obj_id, value in pairs:
+            self.add(obj_id, value)
+
+    def discard(self, obj_id: str):
+        """ Remove `obj_id` from the index
+        """
+        if obj_id not in self._value_by_id:
+            return
+        value = self._value_by_id.pop(obj_id)
+        ids = self._ids_by_value.get(value)
+        if type(ids) is set:
+            ids.discard(obj_id)
+            if len(ids) == 1:
+                self._ids_by_value[value] = ids.pop()
+        elif ids is not None:
+            del self._ids_by_value[value]
+
+    def lookup(self, value: Any) -> Set[str]:
+        """ Return the IDs of the objects whose attribute equals `value`
+        """
+        try:
+            ids = self._ids_by_value.get(value)
+        except TypeError:
+            return set()
+        if ids is None:
+            return set()
+        if type(ids) is set:
+            return ids
+        return {ids}
+
+    def clear(self):
+        """ Remove every entry
+        """
+        self._ids_by_value = {}
+        self._value_by_id = {}
+
+
+class SortedIndex():
+    """ Keeps the IDs of the objects sorted by the value of one attribute
+
+    Values and IDs are held in two parallel sorted lists, so equality,
+    range and prefix lookups are binary searches, and the objects can be
+    walked in attribute order. IDs whose value is None, or cannot be
+    ordered against the others, are kept aside and never match a range.
+
+    An invalidated index ignores additions and removals until `add_many`
+    builds it again, so its owner can defer the build to the first query
+    needing it.
+    """
+    CHUNK_SIZE = 256
+
+    def __init__(self, attribute: str):
+        """ Initialize a SortedIndex
+        """
+        self.attribute = attribute
+        self._values = []
+        self._ids = []
+        self._value_by_id = {}
+        self._unordered = set()
+        self.built = True
+
+    def add(self, obj_id: str, value: Any):
+        """ Index `obj_id` under `value`
+        """
+        if not self.built:
+            return
+        if obj_id in self._value_by_id:
+            if self._value_by_id[obj_id] == value:
+                return
+            self.discard(obj_id)
+        self._value_by_id[obj_id] = value
+        if value is None:
+            self._unordered.add(obj_id)
+            return
+        try:
+            position = bisect_right(self._values, value)
+        except TypeError:
+            self._unordered.add(obj_id)
+            return
+        self._values.insert(position, value)
+        self._ids.insert(position, obj_id)
+
+    def add_many(self, pairs: Iterable[Tuple[str, Any]]):
+        """ Index (ID, value) pairs, sorting them once, which builds an
+        invalidated index
+        """
+        self.built = True
+        ordered = []
+        for obj_id, value in pairs:
+            if obj_id in self._value_by_id:
+                self.discard(obj_id)
+            self._value_by_id[obj_id] = value
+            if value is None:
+                self._unordered.add(obj_id)
+            else:
+                ordered.append((value, obj_id))
+        try:
+            ordered.sort(key=lambda pair: pair[0])
+        except TypeError:
+            for value, obj_id in ordered:
+                del self._value_by_id[obj_id]
+                self.add(obj_id, value)
+            return
+        if self._values:
+            for value, obj_id in ordered:
+                del self._value_by_id[obj_id]
+                self.add(obj_id, value)
+        elif ordered:
+            values, ids = zip(*ordered)
+            self._values = list(values)
+            self._ids = list(ids)
+
+    def discard(self, obj_id: str):
+        """ Remove `obj_id` from the index
+        """
+        if not self.built or obj_id not in self._value_by_id:
+            return
+        value = self._value_by_id.pop(obj_id)
+        if obj_id in self._unordered:
+            self._unordered.discard(obj_id)
+            return
+        position = bisect_left(self._values, value)
+        while self._ids[position] != obj_id:
+            position += 1
+        del self._values[position]
+        del self._ids[position]
+
+    def bounds(self, low: Any = None, high: Any = None,
+               include_low: bool = True,
+               include_high: bool = True) -> Tuple[int, int]:
+        """ Return the positions delimiting the values between `low` and
+        `high`, a bound being ignored when None
+
+        Raises:
+            TypeError: If a bound cannot be compared with the values
+        """
+        start, end = 0, len(self._values)
+        if low is not None:
+            start = (bisect_left if include_low else bisect_right)(
+                self._values, low)
+        if high is not None:
+            end = (bisect_right if include_high else bisect_left)(
+                self._values, high)
+        return start, max(start, end)
+
+    def walk(self, start: int = 0, end: int = None,
+             reverse: bool = False) -> Iterator[str]:
+        """ Yield the IDs between two positions, in attribute order
+
+        IDs are copied `CHUNK_SIZE` at a time, so stopping early costs
+        little and saves made meanwhile do not break the walk.
+        """
+        if end is None:
+            end = len(self._ids)
+        if reverse:
+            while end > start:
+                chunk_start = max(start, end - self.CHUNK_SIZE)
+                yield from reversed(self._ids[chunk_start:end])
+                end = chunk_start
+        else:
+            while start < end:
+                chunk_end = min(end, start + self.CHUNK_SIZE)
+                yield from self._ids[start:chunk_end]
+                start = chunk_end
+
+    def unordered(self) -> Set[str]:
+        """ Return the IDs kept out of the order
+        """
+        return self._unordered
+
+    def lookup(self, value: Any) -> Set[str]:
+        """ Return the IDs of the objects whose attribute equals `value`
+        """
+        if value is None:
+            return {obj_id for obj_id in self._unordered
+                    if self._value_by_id[obj_id] is None}
+        try:
+            start, end = self.bounds(value, value)
+        except TypeError:
+            return set()
+        return set(self._ids[start:end])
+
+    def clear(self):
+        """ Remove every entry
+        """
+        self._values = []
+        self._ids = []
+        self._value_by_id = {}
+        self._unordered = set()
+
+    def invalidate(self):
+        """ Remove every entry and ignore changes until the next build
+        """
+        self.clear()
+        self.built = False
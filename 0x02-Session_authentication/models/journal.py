@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+""" Journal module
+
+Append-only log of model mutations, replayed on top of the last snapshot
+when a class is loaded.
+"""
+import json
+import os
+import threading
+from typing import Callable, Iterator, List, Tuple
+
+
+def file_key(file_path: str) -> tuple:
+    """ Return what identifies the content of a file, None if missing
+    """
+    try:
+        st = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class Journal():
+    """ Append-only journal of one model class
+
+    Every mutation appends one JSON line: `{"op": "save", "obj": {...}}`
+    or `{"op": "remove", "id": "..."}`. Replaying is idempotent, since
+    each record carries the full object.
+
+    Once the journal grows past `max_bytes`, it is compacted in the
+    background: the journal is rotated, the snapshot is rewritten, then the
+    rotated journal is deleted. Only the rotation holds `lock`. If the
+    process dies in between, the rotated journal is replayed before the
+    current one on the next load.
+
+    `lock` guards appends and compactions; passing the lock of the writers
+    of the class keeps both in one lock order. When other processes may
+    rotate the journal, `keep_open` must be False so every append opens
+    the current file.
+    """
+
+    def __init__(self, file_path: str, max_bytes: int, fsync: bool = False,
+                 lock=None, keep_open: bool = True):
+        """ Initialize a Journal
+        """
+        self.file_path = file_path
+        self.old_file_path = file_path + ".old"
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self.lock = lock if lock is not None else threading.RLock()
+        self.keep_open = keep_open
+        self._file = None
+        self._compactor = None
+
+    def _open(self):
+        """ Return the journal file, opened for appending
+        """
+        if self._file is None:
+            self._file = open(self.file_path, 'a')
+        return self._file
+
+    def append(self, record: dict, snapshot: Callable = None):
+        """ Append one record, then start a compaction if needed
+
+        Args:
+            record: `save` or `remove` record
+            snapshot: Callable writing the snapshot file, used for the
+                compaction
+        """
+        self.append_many([record], snapshot)
+
+    def append_many(self, records: List[dict], snapshot: Callable = None):
+        """ Append records in a single write, then start a compaction if
+        needed
+        """
+        lines = "".join(json.dumps(record) + "\n" for record in records)
+        with self.lock:
+            f = self._open()
+            f.write(lines)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+            size = f.tell()
+            if not self.keep_open:
+                f.close()
+                self._file = None
+        if snapshot is not None and size > self.max_bytes:
+            self.compact_in_background(snapshot)
+
+    @staticmethod
+    def save_record(obj_json: dict) -> dict:
+        """ Return the `save` record of a serialized object
+        """
+        return {"op": "save", "obj": obj_json}
+
+    @staticmethod
+    def remove_record(obj_id: str) -> dict:
+        """ Return the `remove` record of an object ID
+        """
+        return {"op": "remove", "id": obj_id}
+
+    def save(self, obj_json: dict, snapshot: Callable = None):
+        """ Append a `save` record
+        """
+        self.append(self.save_record(obj_json), snapshot)
+
+    def remove(self, obj_id: str, snapshot: Callable = None):
+        """ Append a `remove` record
+        """
+        self.append(self.remove_record(obj_id), snapshot)
+
+    def replay(self) -> Iterator[Tuple[str, dict]]:
+        """ Yield (op, record) of the rotated then the current journal
+
+        A partially written last line, left by a crash, is skipped.
+        """
+        for file_path in (self.old_file_path, self.file_path):
+            if not os.path.exists(file_path):
+                continue
+            with open(file_path, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    yield record["op"], record
+
+    def read_from(self, offset: int) -> Tuple[List[Tuple[str, dict]], int]:
+        """ Read the records of the current journal past `offset`
+
+        Returns:
+            List of (op, record), and the offset of the first byte not
+            read. A partially written last line is left for the next read.
+        """
+        if not os.path.exists(self.file_path):
+            return [], offset
+        with open(self.file_path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        records = []
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            records.append((record["op"], record))
+        return records, offset + end
+
+    def rotate(self):
+        """ Move the current journal aside and start an empty one
+        """
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if os.path.exists(self.file_path):
+                os.replace(self.file_path, self.old_file_path)
+
+    def compact(self, snapshot: Callable):
+        """ Rotate the journal, write the snapshot, drop the rotated journal
+
+        The snapshot is written after `lock` is released, so writers keep
+        appending to the new journal meanwhile. The rotated journal is
+        only deleted if no other compaction appended to it since; that
+        compaction deletes it once its own snapshot is written.
+
+        Args:
+            snapshot: Callable writing the snapshot file. It must read the
+                objects after the rotation.
+        """
+        with self.lock:
+            if os.path.exists(self.old_file_path):
+                # A previous compaction did not finish, keep its journal
+                # until a snapshot includes it
+                with open(self.old_file_path, 'a') as old, \
+                        open(self.file_path, 'a+') as current:
+                    current.seek(0)
+                    old.write(current.read())
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                os.remove(self.file_path)
+            else:
+                self.rotate()
+            rotated = file_key(self.old_file_path)
+        snapshot()
+        with self.lock:
+            if rotated is not None and \
+                    file_key(self.old_file_path) == rotated:
+                os.remove(self.old_file_path)
+
+    def compact_in_background(self, snapshot: Callable):
+        """ Start a compaction thread unless one is already running
+        """
+        with self.lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            self._compactor = threading.Thread(target=self.compact,
+                                               args=(snapshot,), daemon=True)
+            self._compactor.start()
+
+    def wait(self):
+        """ Wait for a running compaction to finish
+        """
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+    def reset(self):
+        """ Delete both journals, once a snapshot covers them
+        """
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            for file_path in (self.file_path, self.old_file_path):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+""" Lazy module
+
+Mapping of model objects kept in a compact raw form and hydrated on
+access.
+"""
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from datetime import datetime
+from typing import Any, Callable, Iterator, Tuple
+import threading
+
+
+class RawRecord(tuple):
+    """ Serialized object as (keys, values), the keys tuple being shared by
+    every record with the same layout
+    """
+
+
+class LazyObjects(MutableMapping):
+    """ Objects of one model class, by ID, hydrated on access
+
+    Each object is kept as a RawRecord of its serialized attributes. An
+    object is only built when it is returned, then kept in an LRU cache of
+    `maxsize` objects. Iteration copies the IDs first, so the mapping can
+    be read while it is written.
+    """
+
+    def __init__(self, cls: type, maxsize: int, timestamp_format: str):
+        """ Initialize a LazyObjects mapping
+        """
+        self.cls = cls
+        self.maxsize = maxsize
+        self.timestamp_format = timestamp_format
+        self._raw = {}
+        self._cache = OrderedDict()
+        self._layouts = {}
+        self._lock = threading.Lock()
+
+    def record(self, keys: tuple, values: tuple) -> RawRecord:
+        """ Return the RawRecord of `keys` and `values`
+        """
+        keys = self._layouts.setdefault(keys, keys)
+        return RawRecord((keys, values))
+
+    def compact(self, pairs: list) -> RawRecord:
+        """ Return the RawRecord of a list of (key, value) pairs
+        """
+        keys, values = zip(*pairs)
+        return self.record(keys, values)
+
+    def json_hook(self, pairs: list) -> Any:
+        """ `object_pairs_hook` turning records into RawRecords as the file
+        is parsed, so no dict is built per record
+        """
+        if not pairs or type(pairs[0][1]) is RawRecord:
+            return dict(pairs)
+        return self.compact(pairs)
+
+    def load_raw(self, obj_id: str, raw):
+        """ Store the serialized form of an object, dropping its cached copy
+
+        Args:
+            obj_id: ID of the object
+            raw: RawRecord or dict of serialized attributes
+        """
+        if type(raw) is not RawRecord:
+            raw = self.compact(list(raw.items()))
+        self._raw[obj_id] = raw
+        with self._lock:
+            self._cache.pop(obj_id, None)
+
+    def raw_json(self, obj_id: str) -> dict:
+        """ Return the serialized attributes of an object
+        """
+        keys, values = self._raw[obj_id]
+        return dict(zip(keys, values))
+
+    def cached(self, obj_id: str):
+        """ Return the built object of `obj_id` if it is cached, without
+        building it, otherwise None
+        """
+        with self._lock:
+            return self._cache.get(obj_id)
+
+    def raw_records(self) -> dict:
+        """ Return the serialized forms of the objects, by ID, as a copy
+        later writes do not change
+        """
+        return dict(self._raw)
+
+    def _cache_put(self, obj_id: str, obj):
+        """ Cache a built object, evicting the least recently used one
+        """
+        with self._lock:
+            self._cache[obj_id] = obj
+            self._cache.move_to_end(obj_id)
+            if len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+    def _hydrate(self, obj_id: str, raw: RawRecord = None):
+        """ Return the object, building and caching it if needed
+
+        Args:
+            obj_id: ID of the object
+            raw: RawRecord to build it from, read from the mapping if None
+        """
+        with self._lock:
+            obj = self._cache.get(obj_id)
+            if obj is not None:
+                self._cache.move_to_end(obj_id)
+                return obj
+        keys, values = raw if raw is not None else self._raw[obj_id]
+        obj = self.cls(**dict(zip(keys, values)))
+        self._cache_put(obj_id, obj)
+        return obj
+
+    def __getitem__(self, obj_id: str):
+        if obj_id not in self._raw:
+            raise KeyError(obj_id)
+        return self._hydrate(obj_id)
+
+    def __setitem__(self, obj_id: str, obj):
+        self._raw[obj_id] = self.compact(list(obj.to_json(True).items()))
+        self._cache_put(obj_id, obj)
+
+    def __delitem__(self, obj_id: str):
+        del self._raw[obj_id]
+        with self._lock:
+            self._cache.pop(obj_id, None)
+
+    def __contains__(self, obj_id: object) -> bool:
+        return obj_id in self._raw
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._raw))
+
+    def __len__(self) -> int:
+        return len(self._raw)
+
+    def snapshot(self) -> 'LazyObjects':
+        """ Return the mapping itself, which is safe to iterate while
+        written
+        """
+        return self
+
+    def _raw_equal(self, raw: Any, value: Any) -> bool:
+        """ Compare a serialized value with an attribute value
+
+        Timestamps are serialized as strings or as datetimes, depending on
+        the format the objects were loaded from.
+        """
+        if type(value) is datetime and type(raw) is str:
+            return raw == value.strftime(self.timestamp_format)
+        return raw == value
+
+    def attribute_values(self, attribute: str) -> Iterator[Tuple[str, Any]]:
+        """ Yield (ID, value of `attribute`) of every object
+
+        The value is read from the raw form when it has the attribute, so
+        only objects without it are hydrated.
+        """
+        for obj_id, (keys, values) in list(self._raw.items()):
+            if attribute in keys:
+                yield obj_id, values[keys.index(attribute)]
+            else:
+                yield obj_id, getattr(self._hydrate(obj_id, (keys, values)),
+                                      attribute, None)
+
+    def search(self, attributes: dict, match: Callable) -> Iterator:
+        """ Yield the objects whose attributes match
+
+        Attributes present in the raw form are compared without hydrating;
+        an object is built once it matches them, and `match` checks it.
+
+        Args:
+            attributes: Attribute values to match
+            match: Check of a hydrated object against `attributes`
+        """
+        for obj_id, (keys, values) in list(self._raw.items()):
+            for key, value in attributes.items():
+                if key in keys and \
+                        not self._raw_equal(values[keys.index(key)], value):
+                    break
+            else:
+                obj = self._hydrate(obj_id, (keys, values))
+                if match(obj):
+                    yield obj
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+""" Query module
+
+Lazily evaluated queries over the objects of a model class.
+"""
+from itertools import islice
+from typing import Any, Iterable, Iterator, List, Optional, TypeVar
+
+from models.index import SortedIndex
+from models.lazy import LazyObjects
+
+
+class Range():
+    """ Matches the values between bounds, a bound being ignored when None
+
+    `gt`/`lt` exclude the bound, `ge`/`le` include it.
+    """
+
+    def __init__(self, gt: Any = None, ge: Any = None,
+                 lt: Any = None, le: Any = None):
+        """ Initialize a Range
+        """
+        self.low = gt if gt is not None else ge
+        self.include_low = gt is None
+        self.high = lt if lt is not None else le
+        self.include_high = lt is None
+
+    def matches(self, value: Any) -> bool:
+        """ Check whether `value` lies within the bounds
+        """
+        if value is None:
+            return False
+        try:
+            if self.low is not None and (
+                    value < self.low or
+                    (not self.include_low and value == self.low)):
+                return False
+            if self.high is not None and (
+                    value > self.high or
+                    (not self.include_high and value == self.high)):
+                return False
+        except TypeError:
+            return False
+        return True
+
+    def bounds(self, index: SortedIndex) -> tuple:
+        """ Return the positions of the matching values in `index`
+        """
+        return index.bounds(self.low, self.high,
+                            self.include_low, self.include_high)
+
+
+class Prefix():
+    """ Matches the strings starting with a prefix
+    """
+
+    def __init__(self, prefix: str):
+        """ Initialize a Prefix
+        """
+        self.prefix = prefix
+
+    def matches(self, value: Any) -> bool:
+        """ Check whether `value` starts with the prefix
+        """
+        return isinstance(value, str) and value.startswith(self.prefix)
+
+    def high(self) -> Optional[str]:
+        """ Return the smallest string above every match, None if there
+        is none
+        """
+        if self.prefix and ord(self.prefix[-1]) < 0x10ffff:
+            return self.prefix[:-1] + chr(ord(self.prefix[-1]) + 1)
+        return None
+
+    def bounds(self, index: SortedIndex) -> tuple:
+        """ Return the positions of the matching values in `index`
+        """
+        return index.bounds(self.prefix, self.high(), True, False)
+
+
+PREDICATES = (Range, Prefix)
+
+
+class Query():
+    """ Query over the objects of a model class
+
+    Filters map an attribute to a value, matched by equality, or to a
+    Range or Prefix. The builder methods return the query itself so they
+    can be chained:
+
+        User.query({"created_at": Range(ge=since)}).order_by(
+            "created_at", reverse=True).limit(10)
+
+    Candidates come from an equality on an indexed attribute if there is
+    one, else from a sorted index, else from a scan of a snapshot of the
+    objects. Index hits are looked up in the same snapshot and checked
+    against the filters, so an index a write ahead of the snapshot does
+    not change the results. Objects are only
+    matched as the query is iterated, so `first()` and `limit()` stop as
+    soon as they have enough. Only results that must be sorted without
+    a sorted index are built in full.
+    """
+
+    def __init__(self, cls: type, attributes: dict = None):
+        """ Initialize a Query
+        """
+        self.cls = cls
+        self.attributes = dict(attributes or {})
+        self._order_by = None
+        self._reverse = False
+        self._offset = 0
+        self._limit = None
+
+    def filter(self, attributes: dict = None, **kwargs) -> 'Query':
+        """ Add filters, from a dict and/or keyword arguments
+        """
+        self.attributes.update(attributes or {}, **kwargs)
+        return self
+
+    def order_by(self, attribute: str, reverse: bool = False) -> 'Query':
+        """ Sort the results by `attribute`, objects without it last
+        """
+        self._order_by = attribute
+        self._reverse = reverse
+        return self
+
+    def offset(self, offset: int) -> 'Query':
+        """ Skip the first `offset` results
+        """
+        self._offset = offset
+        return self
+
+    def limit(self, limit: Optional[int]) -> 'Query':
+        """ Return at most `limit` results
+        """
+        self._limit = limit
+        return self
+
+    def _match(self, obj: Any) -> bool:
+        """ Check an object against every filter
+        """
+        for key, value in self.attributes.items():
+            if isinstance(value, PREDICATES):
+                if not value.matches(getattr(obj, key)):
+                    return False
+            elif getattr(obj, key) != value:
+                return False
+        return True
+
+    def _index(self, indexes: dict, attribute: str):
+        """ Return the index of `attribute`, built if it was invalidated,
+        None if there is none
+        """
+        index = indexes.get(attribute)
+        if index is not None and not index.built:
+            self.cls.build_index(attribute)
+        return index
+
+    def _candidates(self, indexes: dict) -> Optional[set]:
+        """ Return the IDs found for the most selective indexed equality,
+        None if no equality filter is indexed
+        """
+        candidates = None
+        for key, value in self.attributes.items():
+            if isinstance(value, PREDICATES):
+                continue
+            index = self._index(indexes, key)
+            if index is None:
+                continue
+            try:
+                hash(value)
+            except TypeError:
+                continue
+            ids = index.lookup(value)
+            if candidates is None or len(ids) < len(candidates):
+                candidates = ids
+        return candidates
+
+    def _walk(self, indexes: dict) -> Optional[Iterator[str]]:
+        """ Return the IDs of a sorted index walk, None if no sorted index
+        orders the results or narrows a Range or Prefix filter
+        """
+        attribute = self._order_by
+        if attribute is None:
+            for key, value in self.attributes.items():
+                if isinstance(value, PREDICATES) and \
+                        isinstance(indexes.get(key), SortedIndex):
+                    attribute = key
+                    break
+        index = self._index(indexes, attribute)
+        if not isinstance(index, SortedIndex):
+            return None
+
+        predicate = self.attributes.get(attribute)
+        if isinstance(predicate, PREDICATES):
+            try:
+                start, end = predicate.bounds(index)
+            except TypeError:
+                return None
+            return index.walk(start, end, self._reverse)
+
+        def walk_all():
+            yield from index.walk(reverse=self._reverse)
+            yield from list(index.unordered())
+        return walk_all()
+
+    def _sorted(self, objs: Iterable) -> List:
+        """ Sort objects by the `order_by` attribute, objects without it
+        last
+        """
+        attribute = self._order_by
+        present, missing = [], []
+        for obj in objs:
+            if getattr(obj, attribute, None) is None:
+                missing.append(obj)
+            else:
+                present.append(obj)
+        present.sort(key=lambda obj: getattr(obj, attribute),
+                     reverse=self._reverse)
+        return present + missing
+
+    def _objects(self) -> Iterator:
+        """ Yield the matching objects, before offset and limit
+
+        Index lookups read the live objects one ID at a time, which is
+        atomic; only full scans take a snapshot, since each snapshot makes
+        the next write copy the objects.
+        """
+        self.cls.refresh()
+        objs = self.cls.objects()
+        indexes = self.cls.indexes()
+
+        candidates = self._candidates(indexes)
+        if candidates is not None:
+            found = filter(self._match, filter(None, (
+                objs.get(obj_id) for obj_id in list(candidates))))
+            if self._order_by is not None:
+                return iter(self._sorted(found))
+            return found
+
+        ids = self._walk(indexes)
+        if ids is not None:
+            return filter(self._match, filter(None, (
+                objs.get(obj_id) for obj_id in ids)))
+
+        objs = self.cls.snapshot()
+        if isinstance(objs, LazyObjects):
+            found = objs.search({key: value for key, value
+                                 in self.attributes.items()
+                                 if not isinstance(value, PREDICATES)},
+                                self._match)
+        else:
+            found = filter(self._match, objs.values())
+        if self._order_by is not None:
+            return iter(self._sorted(found))
+        return found
+
+    def __iter__(self) -> Iterator:
+        engine = self.cls.engine()
+        if engine is not None:
+            return engine.select(self.cls, self.attributes, self._order_by,
+                                 self._reverse, self._offset, self._limit)
+        stop = None if self._limit is None else self._offset + self._limit
+        return islice(self._objects(), self._offset, stop)
+
+    def all(self) -> List[TypeVar('Base')]:
+        """ Return the results as a list
+        """
+        return list(self)
+
+    def first(self) -> Optional[TypeVar('Base')]:
+        """ Return the first result, None if there is none, without
+        looking further
+        """
+        return next(iter(self), None)
+
+    def count(self) -> int:
+        """ Count the results
+        """
+        return sum(1 for _ in self)
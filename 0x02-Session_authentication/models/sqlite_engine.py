@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+""" SQLite engine module
+
+Storage of model objects in an SQLite database, one table per class.
+"""
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+from typing import Any, Iterable, Iterator, Optional
+import json
+import sqlite3
+import threading
+
+from models.query import Prefix, Range
+
+
+UNSUPPORTED = object()
+
+
+class SQLiteEngine():
+    """ Stores each model class in a table of `id` and `data` columns
+
+    `data` is the object serialized as by `to_json(True)`, so classes can
+    keep adding attributes freely and objects read back serialize exactly
+    as before. The attributes a class declares in INDEXED_ATTRIBUTES and
+    SORTED_ATTRIBUTES get an index on their `json_extract` expression,
+    which queries filter and sort on.
+
+    Each thread has its own connection. The database runs in WAL mode, so
+    readers do not wait for writers, in this process or in others.
+    """
+
+    def __init__(self, file_path: str, timestamp_format: str,
+                 synchronous: str = "NORMAL"):
+        """ Initialize an SQLiteEngine
+        """
+        self.file_path = file_path
+        self.timestamp_format = timestamp_format
+        self.synchronous = synchronous
+        self._local = threading.local()
+        self._tables = set()
+
+    def connection(self) -> sqlite3.Connection:
+        """ Return the connection of the current thread
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.file_path, isolation_level=None,
+                                   timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous={}".format(self.synchronous))
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    def close(self):
+        """ Close the connection of the current thread
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    @contextmanager
+    def transaction(self):
+        """ Run the block in a transaction, rolled back if it raises
+
+        A transaction opened inside another one joins it.
+        """
+        conn = self.connection()
+        if self._local.depth:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+        finally:
+            self._local.depth = 0
+
+    @staticmethod
+    def _expr(attribute: str) -> str:
+        """ Return the SQL expression of an attribute
+
+        Raises:
+            ValueError: If the attribute name is not an identifier
+        """
+        if not attribute.isidentifier():
+            raise ValueError("Unsupported attribute name: {}".format(
+                attribute))
+        return "json_extract(data, '$.{}')".format(attribute)
+
+    def _param(self, value: Any) -> Any:
+        """ Return the SQL parameter of a value, UNSUPPORTED if it has none
+        """
+        if type(value) is datetime:
+            return value.strftime(self.timestamp_format)
+        if value is None or isinstance(value, (str, int, float)):
+            return value
+        return UNSUPPORTED
+
+    def table(self, cls: type) -> str:
+        """ Return the table of `cls`, creating it and its indexes if needed
+        """
+        name = cls.__name__
+        if name not in self._tables:
+            conn = self.connection()
+            conn.execute('CREATE TABLE IF NOT EXISTS "{}" '
+                         '(id TEXT PRIMARY KEY, data TEXT NOT NULL)'
+                         .format(name))
+            for attribute in dict.fromkeys(cls.INDEXED_ATTRIBUTES +
+                                           cls.SORTED_ATTRIBUTES):
+                conn.execute('CREATE INDEX IF NOT EXISTS "ix_{0}_{1}" '
+                             'ON "{0}" ({2})'.format(name, attribute,
+                                                     self._expr(attribute)))
+            self._tables.add(name)
+        return name
+
+    def _dumps(self, obj_json: dict) -> str:
+        """ Serialize a record, timestamps as strings
+        """
+        return json.dumps({key: (value.strftime(self.timestamp_format)
+                                 if type(value) is datetime else value)
+                           for key, value in obj_json.items()})
+
+    def save(self, obj: Any):
+        """ Insert or update an object
+        """
+        table = self.table(type(obj))
+        self.connection().execute(
+            'INSERT INTO "{}" (id, data) VALUES (?, ?) '
+            'ON CONFLICT(id) DO UPDATE SET data = excluded.data'
+            .format(table), (obj.id, json.dumps(obj.to_json(True))))
+
+    def save_records(self, cls: type, records: Iterable[dict]):
+        """ Insert or update serialized objects, in one transaction
+        """
+        table = self.table(cls)
+        with self.transaction() as conn:
+            conn.executemany(
+                'INSERT INTO "{}" (id, data) VALUES (?, ?) '
+                'ON CONFLICT(id) DO UPDATE SET data = excluded.data'
+                .format(table),
+                ((record["id"], self._dumps(record)) for record in records))
+
+    def remove(self, obj: Any):
+        """ Delete an object
+        """
+        table = self.table(type(obj))
+        self.connection().execute(
+            'DELETE FROM "{}" WHERE id = ?'.format(table), (obj.id,))
+
+    def get(self, cls: type, obj_id: str) -> Optional[Any]:
+        """ Return one object by ID, None if there is none
+        """
+        row = self.connection().execute(
+            'SELECT data FROM "{}" WHERE id = ?'.format(self.table(cls)),
+            (obj_id,)).fetchone()
+        if row is None:
+            return None
+        return cls(**json.loads(row[0]))
+
+    def count(self, cls: type) -> int:
+        """ Count the objects of `cls`
+        """
+        return self.connection().execute(
+            'SELECT COUNT(*) FROM "{}"'.format(self.table(cls))).fetchone()[0]
+
+    def select(self, cls: type, attributes: dict, order_by: str = None,
+               reverse: bool = False, offset: int = 0,
+               limit: int = None) -> Iterator:
+        """ Yield the objects matching a Query's filters, in its order
+
+        Equalities, Ranges and Prefixes become WHERE clauses, and sorting,
+        offset and limit are done by SQLite. Values with no SQL form, such
+        as lists, are checked on the built objects instead.
+        """
+        where, params, rest = [], [], {}
+        for key, value in attributes.items():
+            expr = self._expr(key)
+            if isinstance(value, Range):
+                bounds = ((value.low, ">=" if value.include_low else ">"),
+                          (value.high, "<=" if value.include_high else "<"))
+            elif isinstance(value, Prefix):
+                bounds = ((value.prefix, ">="), (value.high(), "<"))
+            elif self._param(value) is None:
+                where.append("{} IS NULL".format(expr))
+                continue
+            else:
+                bounds = ((value, "="),)
+            for bound, op in bounds:
+                if bound is None:
+                    continue
+                param = self._param(bound)
+                if param is UNSUPPORTED:
+                    rest[key] = value
+                    continue
+                where.append("{} {} ?".format(expr, op))
+                params.append(param)
+
+        sql = 'SELECT data FROM "{}"'.format(self.table(cls))
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if order_by is not None:
+            expr = self._expr(order_by)
+            sql += " ORDER BY {0} IS NULL, {0}{1}".format(
+                expr, " DESC" if reverse else "")
+        pushed = not rest
+        if pushed and (limit is not None or offset):
+            sql += " LIMIT ? OFFSET ?"
+            params += [-1 if limit is None else limit, offset]
+
+        def objects():
+            for row in self.connection().execute(sql, params):
+                obj = cls(**json.loads(row[0]))
+                if all(value.matches(getattr(obj, key))
+                       if isinstance(value, (Range, Prefix))
+                       else getattr(obj, key) == value
+                       for key, value in rest.items()):
+                    yield obj
+
+        if pushed:
+            return objects()
+        stop = None if limit is None else offset + limit
+        return islice(objects(), offset, stop)
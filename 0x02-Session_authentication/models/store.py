@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+""" Store module
+
+Copy-on-write mapping of model objects.
+"""
+from collections.abc import MutableMapping
+from types import MappingProxyType
+from typing import Any, Callable, Iterator, Mapping
+import threading
+
+
+class Store(MutableMapping):
+    """ Objects of one model class, by ID, readable while being written
+
+    Readers take a `snapshot()`: the current dict, read-only. It is never
+    mutated afterwards, because the first write after a snapshot was taken
+    copies the dict and swaps the copy in. Writes with no snapshot taken
+    since the previous one update the dict in place.
+
+    Readers and writers only share a lock around O(1) steps, so readers
+    never wait for a copy or for a writer. Writes are serialized among
+    themselves.
+    """
+
+    def __init__(self, objs: dict = None):
+        """ Initialize a Store, taking ownership of `objs`
+        """
+        self._objs = objs if objs is not None else {}
+        self._shared = False
+        self._swap_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+
+    def snapshot(self) -> Mapping[str, Any]:
+        """ Return a read-only view of the objects that never changes
+        """
+        with self._swap_lock:
+            self._shared = True
+            return MappingProxyType(self._objs)
+
+    def _write(self, mutate: Callable[[dict], Any]):
+        """ Apply `mutate` to the objects, on a copy if a snapshot of them
+        is out
+        """
+        with self._write_lock:
+            with self._swap_lock:
+                if not self._shared:
+                    return mutate(self._objs)
+                objs = self._objs
+            objs = dict(objs)
+            result = mutate(objs)
+            with self._swap_lock:
+                self._objs = objs
+                self._shared = False
+            return result
+
+    def __getitem__(self, obj_id: str):
+        return self._objs[obj_id]
+
+    def get(self, obj_id: str, default: Any = None):
+        """ Return the object of `obj_id`, `default` if there is none
+
+        Reads the current dict without taking a lock or a snapshot, so a
+        lookup costs one dict access.
+        """
+        return self._objs.get(obj_id, default)
+
+    def __setitem__(self, obj_id: str, obj: Any):
+        self._write(lambda objs: objs.__setitem__(obj_id, obj))
+
+    def __delitem__(self, obj_id: str):
+        self._write(lambda objs: objs.__delitem__(obj_id))
+
+    def pop(self, obj_id: str, *default: Any):
+        """ Remove the object of `obj_id` and return it
+
+        Like `dict.pop`, returns `default` if given and there is no such
+        object, and raises KeyError otherwise. The dict is copied first
+        if a snapshot of it is out.
+        """
+        return self._write(lambda objs: objs.pop(obj_id, *default))
+
+    def __contains__(self, obj_id: object) -> bool:
+        return obj_id in self._objs
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.snapshot())
+
+    def __len__(self) -> int:
+        return len(self._objs)
@@ -8,6 +8,8 @@ from models.base import Base
 class User(Base):
     """ User class
     """
+    INDEXED_ATTRIBUTES = ("email",)
+    SORTED_ATTRIBUTES = ("created_at",)
 
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a User instance
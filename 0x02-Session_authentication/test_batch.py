@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests of the rollback of model batches
+"""
+import os
+import tempfile
+import unittest
+
+from models.user import User
+
+
+class TestBatchRollback(unittest.TestCase):
+    """ Tests of Base.batch rolling back when its block raises """
+    def setUp(self):
+        """ Runs each test on empty models in a temporary directory """
+        self.cwd = os.getcwd()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp_dir.name)
+        User.load_from_file()
+        self.user = User(email="bob@hbtn.io", first_name="Bob")
+        self.user.save()
+
+    def tearDown(self):
+        """ Writes pending changes, then goes back to the working directory
+        """
+        flusher = User.flusher()
+        if flusher is not None:
+            flusher.flush_class(User)
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def test_update(self):
+        """ An attribute updated in a failed batch gets its old value """
+        with self.assertRaises(RuntimeError):
+            with User.batch():
+                self.user.first_name = "Alice"
+                self.user.email = "alice@hbtn.io"
+                self.user.save()
+                raise RuntimeError
+        self.assertEqual(self.user.first_name, "Bob")
+        self.assertEqual(self.user.email, "bob@hbtn.io")
+        self.assertEqual(User.search({"email": "bob@hbtn.io"}), [self.user])
+        self.assertEqual(User.search({"email": "alice@hbtn.io"}), [])
+
+    def test_remove(self):
+        """ An object removed in a failed batch is stored again """
+        with self.assertRaises(RuntimeError):
+            with User.batch():
+                self.user.remove()
+                raise RuntimeError
+        self.assertIs(User.get(self.user.id), self.user)
+        self.assertEqual(User.search({"email": "bob@hbtn.io"}), [self.user])
+
+    def test_create(self):
+        """ An object created in a failed batch is dropped, untouched """
+        with self.assertRaises(RuntimeError):
+            with User.batch():
+                user = User(email="eve@hbtn.io")
+                user.save()
+                raise RuntimeError
+        self.assertIsNone(User.get(user.id))
+        self.assertEqual(user.email, "eve@hbtn.io")
+        self.assertEqual(User.count(), 1)
+
+    def test_commit(self):
+        """ Changes of a batch that does not raise are kept and saved """
+        with User.batch():
+            self.user.first_name = "Alice"
+            self.user.save()
+        self.assertEqual(self.user.first_name, "Alice")
+        User.load_from_file()
+        user = User.get(self.user.id)
+        self.assertIsNot(user, self.user)
+        self.assertEqual(user.first_name, "Alice")
+
+
+if __name__ == "__main__":
+    unittest.main()